@@ -0,0 +1,239 @@
+"""
+Sharded, resumable backfill of local fraud scores over a process pool.
+
+Re-scoring history runs only the local part of the fraud pipeline (the
+`_extract_features` features and the fraud_prescreen rule score), which is
+pure Python and bound by the GIL, so it is spread over processes:
+
+1. partition: input lines are split by a stable hash of user_id into
+   `shards` files in the work directory, so all of a user's transactions
+   land in one shard;
+2. score: a process pool scores shards independently. Per user, one
+   feature_store.UserFeatures is fed the transactions in time order, so each
+   one is scored against the history before it (same 30-day window and
+   features as extract_features) without rebuilding that history;
+3. merge: the per-shard outputs (each in input line order) are merged into
+   one JSONL file in input order. Work-file lines start with a zero-padded
+   line number, so the merge compares them as strings without parsing JSON.
+
+A shard's output is renamed into place only once complete, which is the
+checkpoint: rerunning with the same work directory skips partitioning and
+finished shards. Use more shards than workers so an interrupted run loses
+little work and the pool stays balanced.
+
+    python backfill.py transactions.jsonl -o scores.jsonl --work-dir backfill.work --workers 8
+
+Input lines are transaction dicts as for transaction_stream.py.
+"""
+
+import argparse
+import heapq
+import json
+import os
+import shutil
+import sys
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+import feature_store
+import fraud_prescreen
+
+MANIFEST = "manifest.json"
+# Digits of the line-number prefix on shard output and error lines
+LINE_KEY_WIDTH = 12
+
+
+def _keyed(line_number, result) -> str:
+    """A work-file line: the result's input line number, zero-padded so lines sort as text, then its JSON."""
+    return f"{line_number:0{LINE_KEY_WIDTH}d} {json.dumps(result)}\n"
+
+
+def shard_of(user_id, shards: int) -> int:
+    """Stable across processes and runs (unlike hash())."""
+    return zlib.crc32(str(user_id).encode("utf-8")) % shards
+
+
+def _shard_path(work_dir, shard, kind):
+    return os.path.join(work_dir, f"shard-{shard:05d}.{kind}.jsonl")
+
+
+def partition(input_path, work_dir, shards) -> dict:
+    """Split input into per-shard files of [line, transaction]; unparseable lines go to errors.jsonl."""
+    os.makedirs(work_dir, exist_ok=True)
+    files = [open(_shard_path(work_dir, shard, "in"), "w", encoding="utf-8") for shard in range(shards)]
+    counts = [0] * shards
+    errors = 0
+    try:
+        with open(input_path, encoding="utf-8") as infile, \
+                open(os.path.join(work_dir, "errors.jsonl"), "w", encoding="utf-8") as error_file:
+            for line_number, line in enumerate(infile, 1):
+                if not line.strip():
+                    continue
+                try:
+                    transaction = json.loads(line)
+                    if (not isinstance(transaction, dict) or "user_id" not in transaction
+                            or "timestamp" not in transaction):
+                        raise ValueError("transaction needs 'user_id' and 'timestamp'")
+                    # Shards group by user, so the id must be usable as a key
+                    feature_store.user_key(transaction)
+                except (TypeError, ValueError) as e:
+                    error_file.write(_keyed(line_number, {"line": line_number, "error": str(e)}))
+                    errors += 1
+                    continue
+                shard = shard_of(transaction["user_id"], shards)
+                files[shard].write(f"[{line_number},{line.strip()}]\n")
+                counts[shard] += 1
+    finally:
+        for f in files:
+            f.close()
+    return {"counts": counts, "errors": errors}
+
+
+def score_user(transactions, window=feature_store.HISTORY_WINDOW, min_history=5):
+    """Score one user's (line, transaction) pairs in time order; yields result dicts."""
+    timed = []
+    for line_number, transaction in transactions:
+        try:
+            # Validated up front: an invalid record is reported and never reaches the user's aggregates
+            timestamp = feature_store.parse_event(transaction)[0]
+        except (KeyError, TypeError, ValueError) as e:
+            yield {"line": line_number, "user_id": transaction["user_id"], "error": f"{type(e).__name__}: {e}"}
+            continue
+        timed.append((timestamp, line_number, transaction))
+    # Ties keep input order, as the streaming scorer would see them
+    timed.sort(key=lambda item: item[:2])
+
+    user = feature_store.UserFeatures(window)
+    for timestamp, line_number, transaction in timed:
+        try:
+            features = user.features(timestamp)
+            score = fraud_prescreen.score_transaction(transaction, features, min_history)
+            result = {"line": line_number, "user_id": transaction["user_id"], "features": features,
+                      "risk_level": fraud_prescreen.risk_level(score["fraud_risk_score"]), **score}
+            user.add(transaction)
+        except (KeyError, TypeError, ValueError) as e:
+            result = {"line": line_number, "user_id": transaction["user_id"], "error": f"{type(e).__name__}: {e}"}
+        yield result
+
+
+def score_shard(work_dir, shard, window_days=30, min_history=5) -> int:
+    """Score one shard file and write its output (sorted by line); returns the number of results."""
+    users = {}
+    with open(_shard_path(work_dir, shard, "in"), encoding="utf-8") as f:
+        for line in f:
+            line_number, transaction = json.loads(line)
+            users.setdefault(transaction["user_id"], []).append((line_number, transaction))
+
+    window = timedelta(days=window_days)
+    results = [result for transactions in users.values() for result in score_user(transactions, window, min_history)]
+    results.sort(key=lambda result: result["line"])
+
+    out_path = _shard_path(work_dir, shard, "out")
+    with open(out_path + ".tmp", "w", encoding="utf-8") as f:
+        for result in results:
+            f.write(_keyed(result["line"], result))
+    # Rename last: an existing .out file is a finished shard
+    os.replace(out_path + ".tmp", out_path)
+    return len(results)
+
+
+def merge(work_dir, shards, output_path) -> int:
+    """Merge shard outputs and partition errors into one file in input line order."""
+    paths = [_shard_path(work_dir, shard, "out") for shard in range(shards)] + [os.path.join(work_dir, "errors.jsonl")]
+    files = [open(path, encoding="utf-8") for path in paths]
+    written = 0
+    try:
+        with open(output_path + ".tmp", "w", encoding="utf-8") as out:
+            # The fixed-width prefixes order the lines as plain strings
+            for line in heapq.merge(*files):
+                out.write(line[LINE_KEY_WIDTH + 1:])
+                written += 1
+        os.replace(output_path + ".tmp", output_path)
+    finally:
+        for f in files:
+            f.close()
+    return written
+
+
+def _load_manifest(input_path, work_dir, shards):
+    """The partition manifest if work_dir holds a finished partition of this input, else None."""
+    path = os.path.join(work_dir, MANIFEST)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    stat = os.stat(input_path)
+    if (manifest["input"], manifest["size"], manifest["mtime"]) != (os.path.abspath(input_path), stat.st_size,
+                                                                   stat.st_mtime):
+        raise ValueError(f"{work_dir} holds a backfill of a different input; use another --work-dir or --restart")
+    if shards is not None and shards != manifest["shards"]:
+        raise ValueError(f"{work_dir} was partitioned into {manifest['shards']} shards, not {shards}")
+    return manifest
+
+
+def run(input_path, output_path, work_dir, workers=None, shards=None, window_days=30, min_history=5,
+        restart=False, log=sys.stderr) -> dict:
+    """Partition (unless already done), score unfinished shards, merge. Returns run statistics."""
+    workers = workers or os.cpu_count() or 1
+    if restart and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+
+    start = time.perf_counter()
+    manifest = _load_manifest(input_path, work_dir, shards)
+    if manifest is None:
+        shards = shards or workers * 8
+        counts = partition(input_path, work_dir, shards)
+        stat = os.stat(input_path)
+        manifest = {"input": os.path.abspath(input_path), "size": stat.st_size, "mtime": stat.st_mtime,
+                    "shards": shards, **counts}
+        # Written last: its presence means partitioning finished
+        with open(os.path.join(work_dir, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        print(f"Partitioned {sum(counts['counts'])} transactions into {shards} shards", file=log)
+    shards = manifest["shards"]
+    partition_s = time.perf_counter() - start
+
+    pending = [shard for shard in range(shards) if not os.path.exists(_shard_path(work_dir, shard, "out"))]
+    if len(pending) < shards:
+        print(f"Resuming: {shards - len(pending)} of {shards} shards already done", file=log)
+    start = time.perf_counter()
+    scored = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(score_shard, work_dir, shard, window_days, min_history) for shard in pending]
+        for done, future in enumerate(as_completed(futures), 1):
+            scored += future.result()
+            print(f"Scored shard {done}/{len(pending)}", file=log)
+    score_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    written = merge(work_dir, shards, output_path)
+    merge_s = time.perf_counter() - start
+    return {"shards": shards, "shards_scored": len(pending), "scored": scored, "written": written,
+            "errors": manifest["errors"], "partition_s": partition_s, "score_s": score_s, "merge_s": merge_s}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score historical transactions locally across a process pool.")
+    parser.add_argument("input", help="JSONL file of transactions")
+    parser.add_argument("-o", "--output", required=True, help="merged JSONL results, in input order")
+    parser.add_argument("--work-dir", help="shards and checkpoints (default: OUTPUT.work)")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--shards", type=int, default=None, help="default: 8 per worker")
+    parser.add_argument("--window-days", type=int, default=30, help="history window per transaction")
+    parser.add_argument("--min-history", type=int, default=5, help="history size for full prescreen confidence")
+    parser.add_argument("--restart", action="store_true", help="discard checkpoints in the work directory")
+    parser.add_argument("--keep-work-dir", action="store_true")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or args.output + ".work"
+    stats = run(args.input, args.output, work_dir, args.workers, args.shards, args.window_days, args.min_history,
+                args.restart)
+    if not args.keep_work_dir:
+        shutil.rmtree(work_dir)
+    print(json.dumps(stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,358 @@
+"""
+Benchmarks for the agent entry points and the local hot paths.
+
+End-to-end scenarios run each agent against llm_backends.FakeBackend (no
+network or GPU) and report, per request, wall time percentiles, LLM calls,
+prompt characters and estimated prompt tokens. Microbenchmarks time the
+pure-Python paths (_extract_features vs history length, _format_product_context
+and product retrieval vs catalog size). Results are written as JSON; pass
+--compare with an earlier result file to print the change per metric.
+--prefix-cache makes the simulated backend behave like a provider prefix
+cache and adds the cached share of prompt tokens to each scenario.
+--error-rate makes that share of backend calls fail (429 by default) to
+exercise llm_scheduler's retries and adaptive concurrency.
+
+    python benchmark.py -o bench.json
+    python benchmark.py --quick --compare bench.json
+    python benchmark.py --only advisor_cot fraud_cot --prefix-cache 256
+    python benchmark.py --only fraud --error-rate 0.2 --error-status 429
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import cot_agents
+import llm_backends
+import llm_client
+import llm_scheduler
+import product_context
+import product_index
+import tokens
+import tracing
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+LOCATIONS = ["New York", "Online", "Boston", "Chicago", "New Delhi", "London"]
+CATEGORIES = ["Food", "Grocery", "Retail", "Travel", "Electronics", "Bathroom", "Kitchen", "Home Decor"]
+
+USER_PROFILE = {
+    "user_id": "U1",
+    "age": 42,
+    "income": 120000,
+    "savings": 180000,
+    "risk_tolerance": "moderate",
+    "preferences": {"favorite_categories": ["Kitchen", "Home Decor"]},
+}
+INVESTMENT_GOALS = "Save for college and retirement; invest $1,500 monthly with moderate risk."
+
+
+def percentiles(values) -> dict:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) if values else (0.0, 0.0, 0.0)
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+def make_history(n, seed=0, end=datetime(2025, 4, 19)):
+    rng = random.Random(seed)
+    return [
+        {
+            "timestamp": (end - timedelta(minutes=7 * (i + 1))).isoformat(),
+            "amount": round(rng.uniform(5, 500), 2),
+            "merchant": f"Merchant {rng.randrange(200)}",
+            "merchant_category": rng.choice(CATEGORIES),
+            "location": rng.choice(LOCATIONS),
+        }
+        for i in range(n)
+    ]
+
+
+def make_transaction(seed=0):
+    rng = random.Random(seed)
+    return {
+        "user_id": f"U{seed % 100}",
+        "timestamp": "2025-04-19T03:45:00",
+        "amount": round(rng.uniform(5, 10000), 2),
+        "merchant": "Electronics Store",
+        "merchant_category": rng.choice(CATEGORIES),
+        "location": rng.choice(LOCATIONS),
+    }
+
+
+def make_catalog(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": f"P{i:06d}",
+            "name": f"{rng.choice(['Organic', 'Bamboo', 'Ceramic', 'Recycled', 'Smart'])} "
+                    f"{rng.choice(['Vase', 'Cookware Set', 'Herb Kit', 'Organizer', 'Clock'])} {i}",
+            "category": rng.choice(CATEGORIES),
+            "brand": f"Brand{rng.randrange(50)}",
+            "price": round(rng.uniform(5, 300), 2),
+            "description": "Sustainable everyday product made from recycled materials, built to last for years. " * 2,
+        }
+        for i in range(n)
+    ]
+
+
+def fake_response(plan_steps):
+    """Templated answers: numbered plans for planning prompts, short thoughts otherwise."""
+    plan = "\n".join(f"{i}. Assess factor {i} of the request" for i in range(1, plan_steps + 1))
+
+    def respond(prompt):
+        if "numbered reasoning steps" in prompt or "step-by-step plan" in prompt:
+            return plan
+        if "summarize the fraud risk" in prompt:
+            return '{"fraud_risk_score": 42, "risk_level": "Medium", "explanation": "simulated"}'
+        return "Simulated reasoning for this step. " * 4
+    return respond
+
+
+def schema_response(plan_steps):
+    steps = [{"step": f"{i}. Assess factor {i}", "thought": "Simulated thought."} for i in range(1, plan_steps + 1)]
+
+    def respond(prompt):
+        if "fraud" in prompt:
+            return {"steps": steps, "fraud_risk_score": 42, "risk_level": "Medium", "explanation": "simulated"}
+        if "investment" in prompt:
+            return {"steps": steps, "final_advice": "Simulated advice."}
+        return {"explanations": []}
+    return respond
+
+
+def scenarios(plan_steps, catalog_size):
+    """name -> (cot_agents name, constructor kwargs, request(agent, i))."""
+    catalog = make_catalog(catalog_size)
+    history = make_history(50)
+    purchases = [{"date": "2025-02-10", "product": p["name"], "category": p["category"], "price": p["price"]}
+                 for p in catalog[:5]]
+    browsing = [{"date": "2025-04-18", "viewed_products": [p["name"] for p in catalog[5:8]]}]
+    return {
+        f"advisor_cot[steps={plan_steps}]": (
+            "advisor_cot", {}, lambda agent, i: agent.provide_investment_advice(USER_PROFILE, INVESTMENT_GOALS)),
+        "advisor_cot[single_pass]": (
+            "advisor_cot", {},
+            lambda agent, i: agent.provide_investment_advice(USER_PROFILE, INVESTMENT_GOALS, single_pass=True)),
+        "advisor_manual": (
+            "advisor_manual", {}, lambda agent, i: agent.provide_investment_advice(USER_PROFILE, INVESTMENT_GOALS)),
+        "advisor_ollama": (
+            "advisor_ollama", {}, lambda agent, i: agent.provide_investment_advice(USER_PROFILE, INVESTMENT_GOALS)),
+        f"fraud_cot[steps={plan_steps}]": (
+            "fraud_cot", {}, lambda agent, i: agent.analyze_transaction(make_transaction(i), history)),
+        "fraud_cot[single_pass]": (
+            "fraud_cot", {},
+            lambda agent, i: agent.analyze_transaction(make_transaction(i), history, single_pass=True)),
+        "fraud_manual": (
+            "fraud_manual", {}, lambda agent, i: agent.analyze_transaction(make_transaction(i), history)),
+        "fraud_ollama": (
+            "fraud_ollama", {}, lambda agent, i: agent.analyze_transaction(make_transaction(i), history)),
+        f"recommend[catalog={catalog_size}]": (
+            "recommend", {},
+            lambda agent, i: agent.generate_personalized_recommendations(
+                {**USER_PROFILE, "user_id": f"U{i}"}, purchases, browsing, catalog)),
+        f"recommend_indexed[catalog={catalog_size}]": (
+            "recommend", {"product_index": _build_index(catalog)},
+            lambda agent, i: agent.generate_personalized_recommendations(
+                {**USER_PROFILE, "user_id": f"U{i}"}, purchases, browsing)),
+    }
+
+
+def _build_index(catalog):
+    index = product_index.ProductIndex(capacity=len(catalog))
+    index.add_many(catalog)
+    return index
+
+
+def run_scenario(agent, request, backend, requests):
+    """Run `requests` sequential requests; returns per-request metrics summarized."""
+    latencies, calls, prompt_chars, prompt_tokens = [], [], [], []
+    failed = 0
+    tracing.tracer.reset()
+    backend.clear_prefix_cache()
+    for i in range(requests):
+        first = len(backend.prompts)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                request(agent, i)
+            except llm_backends.FakeBackendError:
+                # Still failing after the scheduler's retries
+                failed += 1
+        latencies.append(time.perf_counter() - start)
+        prompts = backend.prompts[first:]
+        calls.append(len(prompts))
+        prompt_chars.append(sum(len(p) for p in prompts))
+        prompt_tokens.append(sum(tokens.estimate_tokens(p) for p in prompts))
+    results = {
+        "requests": requests,
+        "wall_time_s": float(sum(latencies)),
+        "latency_s": percentiles(latencies),
+        "llm_calls_per_request": float(np.mean(calls)),
+        "prompt_chars_per_request": float(np.mean(prompt_chars)),
+        "prompt_tokens_per_request": float(np.mean(prompt_tokens)),
+    }
+    if backend.error_rate:
+        spans = [span for span in tracing.tracer.spans if span.name == "llm"]
+        results["retries_per_request"] = sum(span.attrs.get("retries", 0) for span in spans) / requests
+        results["failed_requests"] = failed
+        results["final_concurrency_limit"] = llm_client.scheduler.limit
+    if backend.prefix_cache_block:
+        results["cached_token_ratio"] = tracing.tracer.prompt_cache_report()["overall"]["cached_ratio"]
+    return results
+
+
+@contextlib.contextmanager
+def simulated(backend):
+    """
+    Route every shared-client call to `backend` with the response cache off, so each request reaches it,
+    through a fresh scheduler with seeded backoff jitter.
+    """
+    saved_cache, saved_scheduler = llm_client.cache, llm_client.scheduler
+    llm_client.cache = None
+    llm_client.scheduler = llm_scheduler.Scheduler(seed=0)
+    llm_client.set_openai_client(backend)
+    llm_client.set_ollama_client(backend)
+    try:
+        yield backend
+    finally:
+        llm_client.cache, llm_client.scheduler = saved_cache, saved_scheduler
+        llm_client.close()
+
+
+def bench_agents(requests=20, plan_steps=5, catalog_size=1000, latency=0.05, jitter=0.02, tokens_per_second=None,
+                 only=None, prefix_cache_block=None, error_rate=0.0, error_status=429):
+    backend = llm_backends.FakeBackend(response=fake_response(plan_steps), schema_response=schema_response(plan_steps),
+                                       latency=latency, jitter=jitter, tokens_per_second=tokens_per_second, seed=0,
+                                       prefix_cache_block=prefix_cache_block, error_rate=error_rate,
+                                       error_status=error_status)
+    results = {}
+    with simulated(backend):
+        for name, (agent_name, kwargs, request) in scenarios(plan_steps, catalog_size).items():
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            agent = cot_agents.create(agent_name, client=backend, **kwargs)
+            results[name] = run_scenario(agent, request, backend, requests)
+    return results
+
+
+def timed(fn, repeat=5, number=1) -> dict:
+    """Best and median seconds per call over `repeat` rounds of `number` calls."""
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - start) / number)
+    return {"best_s": float(min(rounds)), "median_s": float(np.median(rounds))}
+
+
+def bench_micro(history_sizes=(5, 100, 1000, 10_000, 100_000), catalog_sizes=(10, 100, 1000, 10_000)):
+    results = {}
+    backend = llm_backends.FakeBackend(response=fake_response(3))
+    fraud_agent = cot_agents.create("fraud_manual", client=backend)
+    transaction = make_transaction()
+    for n in history_sizes:
+        history = make_history(n)
+        number = max(1, 20_000 // n)
+        results[f"extract_features[history={n}]"] = timed(
+            lambda: fraud_agent._extract_features(transaction, history), number=number)
+
+    plain = cot_agents.create("recommend", client=backend)
+    cached = cot_agents.create("recommend", client=backend, context_cache=product_context.ProductContextCache())
+    for n in catalog_sizes:
+        catalog = make_catalog(n)
+        cached.context_cache.sync(catalog)
+        results[f"format_product_context[catalog={n}]"] = timed(lambda: plain._format_product_context(catalog),
+                                                                number=200)
+        results[f"format_product_context_cached[catalog={n}]"] = timed(
+            lambda: cached._format_product_context(catalog), number=200)
+        index = _build_index(catalog)
+        results[f"index_candidates[catalog={n}]"] = timed(
+            lambda: index.candidates_for_user(USER_PROFILE, [], [{"viewed_products": [catalog[0]["name"]]}]),
+            number=20)
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """Print the relative change of each timing/size metric present in both result sets."""
+    keys = ("p50", "p95", "p99", "llm_calls_per_request", "prompt_tokens_per_request", "best_s")
+    for section in ("agents", "micro"):
+        for name, metrics in current.get(section, {}).items():
+            before = previous.get(section, {}).get(name)
+            if before is None:
+                continue
+            flat_now = {**metrics, **metrics.get("latency_s", {})}
+            flat_before = {**before, **before.get("latency_s", {})}
+            changes = [
+                f"{key} {100.0 * (flat_now[key] - flat_before[key]) / flat_before[key]:+.1f}%"
+                for key in keys if flat_before.get(key) and key in flat_now
+            ]
+            print(f"{name:48} {', '.join(changes)}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark agent entry points against a simulated backend.")
+    parser.add_argument("-o", "--output", help="write JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier JSON results to compare against")
+    parser.add_argument("--requests", type=int, default=20, help="requests per end-to-end scenario")
+    parser.add_argument("--plan-steps", type=int, default=5, help="steps in simulated CoT plans")
+    parser.add_argument("--catalog-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per LLM call")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--prefix-cache", type=int, metavar="CHARS",
+                        help="simulate provider prefix caching in blocks of CHARS and report cached-token ratios")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of simulated calls that fail")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of simulated failures")
+    parser.add_argument("--only", nargs="*", help="run only scenarios whose names start with these")
+    parser.add_argument("--skip-agents", action="store_true")
+    parser.add_argument("--skip-micro", action="store_true")
+    parser.add_argument("--quick", action="store_true", help="fewer requests and smaller inputs")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.requests = min(args.requests, 5)
+    results = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "settings": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }
+    if not args.skip_agents:
+        results["agents"] = bench_agents(args.requests, args.plan_steps, args.catalog_size, args.latency,
+                                         args.jitter, args.tokens_per_second, args.only, args.prefix_cache,
+                                         args.error_rate, args.error_status)
+    if not args.skip_micro:
+        results["micro"] = (bench_micro((5, 100, 1000, 10_000), (10, 100, 1000)) if args.quick
+                            else bench_micro())
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
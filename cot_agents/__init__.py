@@ -0,0 +1,62 @@
+"""
+The agents as an importable package.
+
+Each agent lives in its own module, and nothing is imported until it is asked
+for: `import cot_agents` loads no agent module, and importing one agent loads
+no others (the Ollama flavours load the agent they subclass). The openai, ollama and data_info modules are imported by
+llm_client/llm_backends on the first real call, so constructing an agent is
+cheap and makes no network requests.
+
+    from cot_agents import FraudDetectionAgent      # loads cot_agents.fraud_manual only
+    agent = cot_agents.create("fraud_ollama", client=runtime)
+
+The numbered scripts at the top level are thin examples over these modules,
+and `python -m cot_agents AGENT input.jsonl` runs any agent over a JSONL file.
+"""
+
+import importlib
+
+# name -> (module, class, method the CLI calls, record fields passed as its arguments)
+AGENTS = {
+    "advisor_cot": ("advisor_cot", "PlanningFinancialAdvisorAgent", "provide_investment_advice",
+                    ("user_profile", "investment_goals")),
+    "advisor_manual": ("advisor_manual", "FinancialAdvisorAgent", "provide_investment_advice",
+                       ("user_profile", "investment_goals")),
+    "advisor_ollama": ("advisor_ollama", "FinancialAdvisorAgent", "provide_investment_advice",
+                       ("user_profile", "investment_goals")),
+    "fraud_cot": ("fraud_cot", "CoTPlanningFraudAgent", "analyze_transaction", ("transaction", "user_history")),
+    "fraud_manual": ("fraud_manual", "FraudDetectionAgent", "analyze_transaction", ("transaction", "user_history")),
+    "fraud_ollama": ("fraud_ollama", "FraudDetectionAgent", "analyze_transaction", ("transaction", "user_history")),
+    "recommend": ("recommend", "ProductRecommendationAgent", "generate_personalized_recommendations",
+                  ("user_profile", "purchase_history", "browsing_behavior", "available_products")),
+}
+
+# Class names exported at package level; the OpenAI flavour wins where names clash
+_EXPORTS = {
+    "PlanningFinancialAdvisorAgent": "advisor_cot",
+    "FinancialAdvisorAgent": "advisor_manual",
+    "CoTPlanningFraudAgent": "fraud_cot",
+    "FraudDetectionAgent": "fraud_manual",
+    "ProductRecommendationAgent": "recommend",
+}
+
+__all__ = ["AGENTS", "agent_class", "create", *_EXPORTS]
+
+
+def agent_class(name: str):
+    """Import the module of agent `name` (a key of AGENTS) and return its class."""
+    module, class_name, _, _ = AGENTS[name]
+    return getattr(importlib.import_module(f"{__name__}.{module}"), class_name)
+
+
+def create(name: str, **kwargs):
+    """Instantiate agent `name`; kwargs go to its constructor (client, feature_store, ...)."""
+    return agent_class(name)(**kwargs)
+
+
+def __getattr__(attr):
+    if attr in _EXPORTS:
+        value = getattr(importlib.import_module(f"{__name__}.{_EXPORTS[attr]}"), attr)
+        globals()[attr] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {attr!r}")
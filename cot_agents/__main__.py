@@ -0,0 +1,61 @@
+"""
+Run any agent over a JSONL file:
+
+    python -m cot_agents fraud_manual transactions.jsonl -o results.jsonl --workers 8
+
+Each input line is a JSON object holding the agent's arguments by name (see
+cot_agents.AGENTS), e.g. {"transaction": {...}, "user_history": [...]} for the
+fraud agents or {"user_profile": {...}, "investment_goals": "..."} for the
+advisors; missing optional fields use the agent's defaults, and an "id" field
+is copied to the output. One result per line is written in input order as
+{"line": n, "id": ..., "result": ...} or {"line": n, "error": "..."}.
+Only `max_pending` records are in flight at once, so large files stream
+(see jsonl_pipeline).
+"""
+
+import argparse
+import contextlib
+import functools
+import sys
+
+import cot_agents
+import jsonl_pipeline
+import tracing
+
+
+def _run(method, fields, line_number, record):
+    output = {"line": line_number}
+    if "id" in record:
+        output["id"] = record["id"]
+    try:
+        output["result"] = method(**{field: record[field] for field in fields if field in record})
+    except Exception as e:
+        output["error"] = f"{type(e).__name__}: {e}"
+    return output
+
+
+def run(name, agent, lines, out, workers=4, max_pending=64) -> int:
+    """Feed every record in `lines` to agent `name` and write JSONL results to `out`. Returns the count written."""
+    _, _, method_name, fields = cot_agents.AGENTS[name]
+    method = functools.partial(_run, getattr(agent, method_name), fields)
+    return jsonl_pipeline.process(jsonl_pipeline.read_objects(lines), method, out, workers, max_pending)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m cot_agents", description="Run an agent over a JSONL file.")
+    parser.add_argument("agent", choices=sorted(cot_agents.AGENTS))
+    jsonl_pipeline.add_arguments(parser)
+    parser.add_argument("--trace", help="append the run's spans to this JSONL file")
+    args = parser.parse_args(argv)
+
+    agent = cot_agents.create(args.agent)
+    # Some agents print progress; keep it out of the results
+    with jsonl_pipeline.opened(args) as (infile, outfile), contextlib.redirect_stdout(sys.stderr):
+        count = run(args.agent, agent, infile, outfile, args.workers, args.max_pending)
+    if args.trace:
+        tracing.tracer.export_jsonl(args.trace)
+    print(f"Processed {count} records", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Planning (CoT) financial advisor: plan, concurrent step reasoning, summary."""
+
+import llm_client
+import plan_executor
+import prompt_builder
+import tracing
+
+
+class PlanningFinancialAdvisorAgent:
+
+    # Schema for the single-pass mode: plan, per-step reasoning and final advice in one answer
+    SINGLE_PASS_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"step": {"type": "string"}, "thought": {"type": "string"}},
+                    "required": ["step", "thought"],
+                    "additionalProperties": False,
+                },
+            },
+            "final_advice": {"type": "string"},
+        },
+        "required": ["steps", "final_advice"],
+        "additionalProperties": False,
+    }
+
+    # Token budget per prompt; long goals and earlier-step reasoning are trimmed to fit
+    prompt_budget = prompt_builder.DEFAULT_BUDGET
+
+    def __init__(self, client=None):
+        # None means the shared pooled client from llm_client
+        self.client = client
+
+    def query_gpt(self, prompt: str, use_cache=True) -> str:
+        return llm_client.query_openai(prompt, client=self.client, use_cache=use_cache)
+
+    def _context_prefix(self, user_profile, investment_goals) -> str:
+        """
+        Static start of the plan and step prompts (instructions, profile, goals). Keeping it
+        byte-identical across a run lets provider prefix caching / Ollama KV reuse skip it.
+        """
+        return prompt_builder.build("""
+        You are a financial planning assistant. A client has given you a profile and investment goals.
+        
+        CLIENT PROFILE:
+        {profile}
+        
+        INVESTMENT GOALS:
+        {goals}
+        """, self.prompt_budget // 2, profile=user_profile, goals=prompt_builder.Text(investment_goals)).text
+
+    @tracing.traced("plan")
+    def generate_plan(self, user_profile, investment_goals) -> list:
+        """Step 1: Generate a plan (a list of reasoning steps)"""
+        plan_prompt = prompt_builder.build("""{prefix}
+        Your task is to generate a step-by-step reasoning plan to create an investment strategy.
+        Generate a list of numbered reasoning steps to guide investment advice.
+        """, self.prompt_budget, prefix=self._context_prefix(user_profile, investment_goals))
+        plan_text = self.query_gpt(plan_prompt.text)
+        steps = [step.strip() for step in plan_text.split('\n') if step.strip() and step[0].isdigit()]
+        return steps
+
+    def execute_plan(self, user_profile, investment_goals, steps: list, max_workers=4, dependencies=None) -> list:
+        """Step 2: Run each step with reasoning (independent steps run concurrently)"""
+        if dependencies is None:
+            dependencies = plan_executor.find_step_dependencies(steps)
+        prefix = self._context_prefix(user_profile, investment_goals)
+
+        def run_step(index, step, prior_results):
+            # Only the suffix (earlier results, this step) varies between step prompts
+            earlier = "".join(f"\n            {s}\n            {thought}\n" for s, thought in prior_results.values())
+            reasoning_prompt = """{prefix}
+            As the client's financial advisor, reason through this step using the information above.
+            """
+            if earlier:
+                reasoning_prompt += """
+            EARLIER STEPS:
+            {earlier}"""
+            reasoning_prompt += """
+            Step: {step}
+            
+            Thought:"""
+            with tracing.span("step", index=index):
+                prompt = prompt_builder.build(reasoning_prompt, self.prompt_budget, prefix=prefix, step=step,
+                                              earlier=prompt_builder.Text(earlier, keep="tail"))
+                return step, self.query_gpt(prompt.text)
+
+        return plan_executor.run_steps(steps, run_step, max_workers=max_workers, dependencies=dependencies)
+
+    @tracing.traced("summary")
+    def summarize_recommendation(self, results: list) -> str:
+        """Step 3: Compile all thoughts into a final recommendation"""
+        return self.query_gpt(self._summary_prompt(results))
+
+    def _summary_prompt(self, results: list) -> str:
+        compiled = "\n".join([f"{step}\n{thought}" for step, thought in results])
+        return prompt_builder.build("""
+        You are a financial planner. Summarize the findings and generate a final, personalized investment strategy based on the following step-by-step reasoning:
+        
+        {compiled}
+        
+        Final Answer:""", self.prompt_budget, compiled=prompt_builder.Text(compiled, keep="tail")).text
+
+    @tracing.traced("single_pass")
+    def plan_and_advise_single_pass(self, user_profile, investment_goals):
+        """Plan, per-step reasoning and final advice in one schema-constrained round-trip"""
+        prompt = prompt_builder.build("""
+        You are a financial planning assistant. A client has given you a profile and investment goals.
+        
+        Generate a numbered step-by-step reasoning plan to create an investment strategy,
+        reason through each step, then summarize the findings into a final, personalized investment strategy.
+        
+        CLIENT PROFILE:
+        {profile}
+        
+        INVESTMENT GOALS:
+        {goals}
+        """, self.prompt_budget, profile=user_profile, goals=prompt_builder.Text(investment_goals))
+        answer = llm_client.query_openai_json(prompt.text, self.SINGLE_PASS_SCHEMA, name="investment_plan",
+                                              client=self.client)
+        results = [(item["step"], item["thought"]) for item in answer["steps"]]
+        return [step for step, _ in results], results, answer["final_advice"]
+
+    @tracing.traced("provide_investment_advice")
+    def provide_investment_advice(self, user_profile, investment_goals, single_pass=False):
+        if single_pass:
+            steps, results, final_answer = self.plan_and_advise_single_pass(user_profile, investment_goals)
+        else:
+            steps = self.generate_plan(user_profile, investment_goals)
+            results = self.execute_plan(user_profile, investment_goals, steps)
+            final_answer = self.summarize_recommendation(results)
+
+        # Optional: print intermediate steps
+        print("PLAN:")
+        for step in steps:
+            print(" -", step)
+
+        print("\n STEP-BY-STEP THOUGHTS:")
+        for i, (step, thought) in enumerate(results, 1):
+            print(f"\nStep {i}: {step}\n{thought}")
+
+        print("\n *****FINAL ADVICE*******:")
+        return final_answer
+
+    @tracing.traced("stream_investment_advice")
+    def stream_investment_advice(self, user_profile, investment_goals, single_pass=False):
+        """
+        Run the plan and steps, then yield the final advice in chunks as it is generated.
+        Only the summary streams: nothing is yielded until the plan and every step have
+        finished (with single_pass the whole answer is yielded at once). The generator
+        returns the full advice, like provide_investment_advice.
+        """
+        if single_pass:
+            _, _, final_answer = self.plan_and_advise_single_pass(user_profile, investment_goals)
+            yield final_answer
+            return final_answer
+        steps = self.generate_plan(user_profile, investment_goals)
+        results = self.execute_plan(user_profile, investment_goals, steps)
+
+        def summary():
+            stream = llm_client.stream_openai(self._summary_prompt(results), client=self.client)
+            return (yield from llm_client.relay(stream))
+        return (yield from tracing.span_generator("summary", summary()))
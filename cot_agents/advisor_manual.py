@@ -0,0 +1,56 @@
+"""
+Financial advisor with a hand-written chain-of-thought prompt. The agent runs
+on any llm_client backend (OpenAI by default; see advisor_ollama for Ollama).
+"""
+
+import llm_client
+import prompt_builder
+import tracing
+
+
+class FinancialAdvisorAgent:
+
+    # Token budget per prompt; overly long goals are trimmed to fit
+    prompt_budget = prompt_builder.DEFAULT_BUDGET
+    # llm_client backend ("openai" or "ollama") and model (None: the backend's default)
+    backend = "openai"
+    model = None
+
+    def __init__(self, client=None, backend=None, model=None):
+        self.client = client
+        if backend is not None:
+            self.backend = backend
+        if model is not None:
+            self.model = model
+
+    @tracing.traced("provide_investment_advice")
+    def provide_investment_advice(self, user_profile, investment_goals):
+        """Generate personalized investment advice using chain-of-thought reasoning."""
+        prompt = self._advice_prompt(user_profile, investment_goals)
+        return llm_client.query(prompt, self.backend, self.model, self.client)
+
+    @tracing.traced("stream_investment_advice")
+    def stream_investment_advice(self, user_profile, investment_goals):
+        """Yield the advice in chunks as it is generated; the generator returns the full advice."""
+        prompt = self._advice_prompt(user_profile, investment_goals)
+        return (yield from llm_client.relay(
+            llm_client.stream(prompt, self.backend, self.model, self.client)))
+
+    def _advice_prompt(self, user_profile, investment_goals):
+        return prompt_builder.build("""
+        As a financial advisor, provide investment recommendations for this client basis on only the information from year 2020-2024:
+
+        CLIENT PROFILE:
+        {profile}
+
+        INVESTMENT GOALS:
+        {goals}
+
+        Let's think through this step-by-step:
+        1. Analyze the client's risk tolerance based on age, financial situation, and goals
+        2. Consider current market conditions and economic factors
+        3. Evaluate appropriate asset allocation (stocks, bonds, alternatives)
+        4. Recommend specific investment vehicles and explain the rationale
+        5. Address potential concerns and provide risk mitigation strategies
+        
+        """, self.prompt_budget, profile=user_profile, goals=prompt_builder.Text(investment_goals)).text
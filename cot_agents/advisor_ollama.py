@@ -0,0 +1,12 @@
+"""Financial advisor with a hand-written chain-of-thought prompt on a local Ollama model."""
+
+from cot_agents import advisor_manual
+
+model = "gemma3:1b"  # Example AI models from Ollama llama2
+
+
+class FinancialAdvisorAgent(advisor_manual.FinancialAdvisorAgent):
+    """advisor_manual's agent on the Ollama backend."""
+
+    backend = "ollama"
+    model = model
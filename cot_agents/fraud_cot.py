@@ -0,0 +1,171 @@
+"""Planning (CoT) fraud analysis: plan, per-step reasoning, final risk report."""
+
+import fraud_batch
+import fraud_features
+import llm_client
+import prompt_builder
+import tracing
+
+
+class CoTPlanningFraudAgent:
+
+    # Schema for the single-pass mode: plan, per-step reasoning and the final report in one answer
+    SINGLE_PASS_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "steps": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"step": {"type": "string"}, "thought": {"type": "string"}},
+                    "required": ["step", "thought"],
+                    "additionalProperties": False,
+                },
+            },
+            "fraud_risk_score": {"type": "number"},
+            "risk_level": {"type": "string", "enum": ["Low", "Medium", "High"]},
+            "explanation": {"type": "string"},
+        },
+        "required": ["steps", "fraud_risk_score", "risk_level", "explanation"],
+        "additionalProperties": False,
+    }
+
+    # Token budget per prompt; the reasoning log fed to the final step is trimmed to fit
+    prompt_budget = prompt_builder.DEFAULT_BUDGET
+
+    def __init__(self, client=None, feature_store=None):
+        self.client = client
+        # Optional feature_store.FeatureStore or history_store.HistoryStore, read when no user_history is passed
+        self.feature_store = feature_store
+
+    @tracing.traced("analyze_transaction")
+    def analyze_transaction(self, transaction, user_history=None, single_pass=False, features=None):
+        """
+        Main entry point for CoT-style fraud analysis (single_pass=True uses one structured call).
+        `features` may pass an already computed _extract_features result.
+        """
+        if features is None:
+            features = self._extract_features(transaction, user_history)
+        if single_pass:
+            return self._analyze_single_pass(transaction, features)
+
+        plan, reasoning_log = self._plan_and_reason(transaction, features)
+
+        # Step 3: Generate final fraud risk score
+        with tracing.span("summary"):
+            final_result = self.query_gpt(self._final_prompt(reasoning_log))
+
+        return {
+            "plan": plan,
+            "step_analysis": reasoning_log,
+            # Parsed as in single-pass mode; an answer without a usable JSON report becomes the explanation
+            "fraud_report": fraud_batch.text_report(final_result),
+            "features": features
+        }
+
+    @tracing.traced("stream_analysis")
+    def stream_analysis(self, transaction, user_history=None):
+        """
+        Run the plan and steps, then yield the final fraud report in chunks as it is
+        generated. Only the final report streams: nothing is yielded until the plan
+        and every step have finished, so the first chunk still waits for them. The
+        generator returns the same dict as analyze_transaction.
+        """
+        features = self._extract_features(transaction, user_history)
+        plan, reasoning_log = self._plan_and_reason(transaction, features)
+
+        def summary():
+            stream = llm_client.stream_openai(self._final_prompt(reasoning_log), client=self.client)
+            return (yield from llm_client.relay(stream))
+        final_result = yield from tracing.span_generator("summary", summary())
+        return {
+            "plan": plan,
+            "step_analysis": reasoning_log,
+            "fraud_report": fraud_batch.text_report(final_result),
+            "features": features
+        }
+
+    def _plan_and_reason(self, transaction, features):
+        """Steps 1 and 2: generate the plan, then reason through each step. Returns (plan, reasoning_log)."""
+        # The plan and every step prompt start with the same static prefix (instructions, transaction,
+        # features) so provider prefix caching / Ollama KV reuse can skip it; only the suffix varies
+        prefix = prompt_builder.build("""You are a financial fraud analyst.
+        Your task is to analyze this transaction step-by-step.
+        
+        CURRENT TRANSACTION:
+        {transaction}
+        
+        USER HISTORY SUMMARY:
+        {features}
+        """, self.prompt_budget // 2, transaction=transaction, features=features).text
+
+        # Step 1: Generate a plan
+        plan_prompt = prefix + """
+        Write a clear step-by-step plan to assess fraud risk (numbered steps).
+        """
+        with tracing.span("plan"):
+            plan = self.query_gpt(plan_prompt)
+
+        # Step 2: Execute each step one by one
+        steps = plan.strip().split("\n")
+        reasoning_log = ""
+        for index, step in enumerate(steps):
+            if not step.strip(): continue
+            reasoning_log += f"\n {step}\n"
+            with tracing.span("step", index=index):
+                step_reasoning = self.query_gpt(prefix + f"""
+        Perform this step of the analysis using the transaction and user data above:
+        Step: {step}
+        """)
+            reasoning_log += f" Thought: {step_reasoning.strip()}\n"
+
+        return plan, reasoning_log
+
+    def _final_prompt(self, reasoning_log):
+        return prompt_builder.build("""Based on the analysis steps above, summarize the fraud risk as a JSON object with this format:
+        
+          "fraud_risk_score": <0-100>,
+          "risk_level": "<Low|Medium|High>",
+          "explanation": "..."
+
+        Analysis Steps: {reasoning_log}
+        """, self.prompt_budget, reasoning_log=prompt_builder.Text(reasoning_log, keep="tail")).text
+
+    @tracing.traced("single_pass")
+    def _analyze_single_pass(self, transaction, features):
+        """Plan, per-step reasoning and final score in one schema-constrained round-trip."""
+        prompt = prompt_builder.build("""You are a financial fraud analyst.
+        Analyze this transaction step-by-step: write a clear numbered plan to assess fraud risk,
+        reason through each step, then give the final fraud risk assessment.
+        
+        CURRENT TRANSACTION:
+        {transaction}
+        
+        USER HISTORY SUMMARY:
+        {features}
+        """, self.prompt_budget, transaction=transaction, features=features)
+        answer = llm_client.query_openai_json(prompt.text, self.SINGLE_PASS_SCHEMA, name="fraud_analysis",
+                                              client=self.client)
+
+        plan = "\n".join(item["step"] for item in answer["steps"])
+        reasoning_log = "".join(f"\n {item['step']}\n Thought: {item['thought'].strip()}\n" for item in answer["steps"])
+        return {
+            "plan": plan,
+            "step_analysis": reasoning_log,
+            "fraud_report": {
+                "fraud_risk_score": answer["fraud_risk_score"],
+                "risk_level": answer["risk_level"],
+                "explanation": answer["explanation"],
+            },
+            "features": features
+        }
+
+    def _extract_features(self, transaction, history):
+        """Extract relevant features from transaction history (or the feature store)."""
+        if history is None and self.feature_store is not None:
+            return self.feature_store.features(transaction["user_id"], transaction["timestamp"])
+        return fraud_features.extract_features(transaction, history or [])
+
+    def query_gpt(self, prompt: str, use_cache=True) -> str:
+        """Query GPT for a response (use_cache=False forces a fresh call)."""
+        return llm_client.query_openai(prompt, client=self.client, use_cache=use_cache)
@@ -0,0 +1,99 @@
+"""
+Fraud detection with a hand-written chain-of-thought prompt. The agent runs on
+any llm_client backend (OpenAI by default; see fraud_ollama for Ollama).
+"""
+
+import fraud_batch
+import fraud_features
+import llm_client
+import prompt_builder
+import tracing
+
+
+class FraudDetectionAgent:
+
+    # Token budget per prompt
+    prompt_budget = prompt_builder.DEFAULT_BUDGET
+    # llm_client backend ("openai" or "ollama") and model (None: the backend's default)
+    backend = "openai"
+    model = None
+
+    def __init__(self, client=None, feature_store=None, backend=None, model=None):
+        self.client = client
+        # Optional feature_store.FeatureStore or history_store.HistoryStore, read when no user_history is passed
+        self.feature_store = feature_store
+        if backend is not None:
+            self.backend = backend
+        if model is not None:
+            self.model = model
+
+    def _query(self, prompt):
+        return llm_client.query(prompt, self.backend, self.model, self.client)
+
+    @tracing.traced("analyze_transaction")
+    def analyze_transaction(self, transaction, user_history=None, features=None):
+        """
+        Analyze a transaction using multi-step reasoning to detect potential fraud.
+        `features` may pass an already computed _extract_features result.
+        """
+
+        # Calculate basic features
+        if features is None:
+            features = self._extract_features(transaction, user_history)
+
+        # Use the LLM for reasoning about fraud likelihood
+        prompt = self._analysis_prompt(transaction, features)
+
+        analysis = self._query(prompt)
+
+        # Extract the risk score using regex or parsing logic
+        # For simplicity, we're returning the full analysis
+        return {
+            "analysis": analysis,
+            "features": features
+        }
+
+    @tracing.traced("stream_analysis")
+    def stream_analysis(self, transaction, user_history=None):
+        """
+        Yield the analysis in chunks as it is generated; the generator returns the
+        same dict as analyze_transaction.
+        """
+        features = self._extract_features(transaction, user_history)
+        prompt = self._analysis_prompt(transaction, features)
+        analysis = yield from llm_client.relay(
+            llm_client.stream(prompt, self.backend, self.model, self.client))
+        return {
+            "analysis": analysis,
+            "features": features
+        }
+
+    def _analysis_prompt(self, transaction, features):
+        return prompt_builder.build("""
+        Analyze this financial transaction for potential fraud:
+
+        CURRENT TRANSACTION:
+        {transaction}
+
+        USER HISTORY SUMMARY:
+        {features}
+
+        Think step-by-step to determine if this transaction is fraudulent:
+        1. Analyze location patterns and whether the current transaction location is suspicious
+        2. Evaluate transaction amount in relation to user's typical spending
+        3. Consider the merchant category and if it aligns with user's normal habits
+        4. Assess transaction timing and frequency compared to patterns
+        5. Identify specific fraud indicators present in this transaction
+        6. Provide a fraud risk score (0-100) with explanation in a json format
+        """, self.prompt_budget, transaction=transaction, features=features).text
+
+    @tracing.traced("analyze_transactions")
+    def analyze_transactions(self, items, batch_size=20):
+        """Score many transactions with one prompt per batch; see fraud_batch.analyze_batch for the item format."""
+        return fraud_batch.analyze_batch(self, items, self._query, batch_size, self.prompt_budget)
+
+    def _extract_features(self, transaction, history):
+        """Extract relevant features from transaction history (or the feature store)."""
+        if history is None and self.feature_store is not None:
+            return self.feature_store.features(transaction["user_id"], transaction["timestamp"])
+        return fraud_features.extract_features(transaction, history or [])
@@ -0,0 +1,28 @@
+"""Fraud detection with a hand-written chain-of-thought prompt on a local Ollama model."""
+
+import ollama_runtime
+import tracing
+from cot_agents import fraud_manual
+
+model = "gemma3:1b"
+
+
+class FraudDetectionAgent(fraud_manual.FraudDetectionAgent):
+    """fraud_manual's agent on the Ollama backend."""
+
+    backend = "ollama"
+    model = model
+
+    @tracing.traced("analyze_concurrently")
+    def analyze_concurrently(self, items):
+        """
+        analyze_transaction for a list of (transaction, user_history) pairs. With an
+        ollama_runtime.OllamaRuntime client the prompts run concurrently (up to its
+        parallelism), still through llm_client; otherwise they run one by one.
+        """
+        if not isinstance(self.client, ollama_runtime.OllamaRuntime):
+            return [self.analyze_transaction(transaction, history) for transaction, history in items]
+        features = [self._extract_features(transaction, history) for transaction, history in items]
+        prompts = [self._analysis_prompt(transaction, f) for (transaction, _), f in zip(items, features)]
+        analyses = self.client.generate_many(prompts, model=self.model)
+        return [{"analysis": analysis, "features": f} for analysis, f in zip(analyses, features)]
@@ -0,0 +1,266 @@
+"""Personalized product recommendations and explanations."""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import llm_client
+import product_context
+import prompt_builder
+import tracing
+import user_analysis_cache
+
+
+class ProductRecommendationAgent:
+
+    # Schema for explaining several products in one structured call
+    EXPLANATIONS_SCHEMA = {
+        "type": "object",
+        "properties": {
+            "explanations": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {"product_id": {"type": "string"}, "explanation": {"type": "string"}},
+                    "required": ["product_id", "explanation"],
+                    "additionalProperties": False,
+                },
+            },
+        },
+        "required": ["explanations"],
+        "additionalProperties": False,
+    }
+
+    # Token budget per prompt; long purchase/browsing histories are trimmed (most relevant and recent first)
+    prompt_budget = prompt_builder.DEFAULT_BUDGET
+
+    def __init__(self, client=None, product_index=None, candidate_count=20, context_cache=None,
+                 analysis_cache=None):
+        self.client = client
+        # Optional product_index.ProductIndex; when set, only the top candidates reach the prompt
+        self.product_index = product_index
+        self.candidate_count = candidate_count
+        # Optional product_context.ProductContextCache, kept in sync with the catalog by the caller
+        self.context_cache = context_cache
+        # Optional user_analysis_cache.UserAnalysisCache, reused across requests for the same user
+        self.analysis_cache = analysis_cache
+
+    @tracing.traced("generate_personalized_recommendations")
+    def generate_personalized_recommendations(self, user_profile, purchase_history, browsing_behavior,
+                                              available_products=None):
+        """Generate personalized product recommendations using multi-step reasoning."""
+        user_analysis, prompt = self._prepare_recommendation(user_profile, purchase_history, browsing_behavior,
+                                                             available_products)
+        with tracing.span("recommendation"):
+            recommendations = llm_client.query_openai(prompt, client=self.client)
+
+        return {
+            "user_analysis": user_analysis,
+            "recommendations": recommendations
+        }
+
+    @tracing.traced("stream_personalized_recommendations")
+    def stream_personalized_recommendations(self, user_profile, purchase_history, browsing_behavior,
+                                            available_products=None):
+        """
+        Yield the recommendations in chunks as they are generated. The generator
+        returns the same dict as generate_personalized_recommendations.
+        """
+        user_analysis, prompt = self._prepare_recommendation(user_profile, purchase_history, browsing_behavior,
+                                                             available_products)
+        stream = llm_client.relay(llm_client.stream_openai(prompt, client=self.client))
+        recommendations = yield from tracing.span_generator("recommendation", stream)
+        return {
+            "user_analysis": user_analysis,
+            "recommendations": recommendations
+        }
+
+    def _prepare_recommendation(self, user_profile, purchase_history, browsing_behavior, available_products):
+        """User analysis and the recommendation prompt built from it. Returns (user_analysis, prompt)."""
+        # First, analyze user preferences and patterns
+        user_id = user_profile.get("user_id")
+        if self.analysis_cache is not None and user_id:
+            version = user_analysis_cache.fingerprint(user_profile, purchase_history, browsing_behavior)
+            user_analysis = self.analysis_cache.get(
+                user_id, version,
+                lambda: self._analyze_user_behavior(user_profile, purchase_history, browsing_behavior),
+            )
+        else:
+            user_analysis = self._analyze_user_behavior(user_profile, purchase_history, browsing_behavior)
+
+        # Narrow a large catalog down to the products most relevant to this user
+        if self.product_index is not None:
+            available_products = self.product_index.candidates_for_user(
+                user_profile, purchase_history, browsing_behavior, k=self.candidate_count
+            )
+
+        # Create product summaries for context (for a real system, this would be pre-processed)
+        product_context = self._format_product_context(available_products)
+
+        # Generate recommendations with reasoning
+        return user_analysis, self._recommendation_prompt(user_analysis, product_context)
+
+    def _recommendation_prompt(self, user_analysis, product_context):
+        return prompt_builder.build("""
+        Generate personalized product recommendations based on this user analysis:
+
+        USER ANALYSIS:
+        {user_analysis}
+
+        AVAILABLE PRODUCTS:
+        {product_context}
+
+        Using the user analysis and available products, follow these steps:
+        1. Identify key preferences and interests from the user's profile and behavior
+        2. Find patterns in past purchases that suggest product categories of interest
+        3. Consider the user's browsing behavior to identify current interests
+        4. Match these preferences to the available products
+        5. Rank recommendations based on relevance and likelihood of interest
+
+        Provide your top 5 product recommendations with a detailed explanation for each,
+        including why this specific product matches the user's preferences and behavior.
+        Format as a numbered list with product name and reasoning for each recommendation.
+        """, self.prompt_budget, user_analysis=prompt_builder.Text(user_analysis),
+            product_context=prompt_builder.Text(product_context)).text
+
+    @tracing.traced("user_analysis")
+    def _analyze_user_behavior(self, user_profile, purchase_history, browsing_behavior):
+        """Analyze user behavior to identify preferences and patterns."""
+
+        favorites = set(((user_profile or {}).get("preferences") or {}).get("favorite_categories") or [])
+        prompt = prompt_builder.build("""
+        Analyze this user's behavior to identify preferences, patterns, and potential interests:
+
+        USER PROFILE:
+        {profile}
+
+        PURCHASE HISTORY:
+        {purchases}
+
+        BROWSING BEHAVIOR:
+        {browsing}
+
+        Provide a comprehensive analysis that includes:
+        1. Key demographic insights and how they might influence preferences
+        2. Primary product categories of interest based on purchases and browsing
+        3. Price sensitivity and typical spending patterns
+        4. Brand preferences or loyalty indicators
+        5. Seasonal or situational shopping patterns
+        6. Potential upcoming needs based on past behavior
+
+        Focus on extracting actionable insights for product recommendations.
+        """, self.prompt_budget, profile=user_profile,
+            # Histories are newest first; purchases in a favorite category rank ahead of the rest
+            purchases=prompt_builder.History(purchase_history, relevance=lambda p: p.get("category") in favorites),
+            browsing=prompt_builder.History(browsing_behavior))
+
+        return llm_client.query_openai(prompt.text, client=self.client)
+
+    def _format_product_context(self, products):
+        """Format product information for inclusion in prompts."""
+        # Limit to 20 products for context length
+        if self.context_cache is not None:
+            return self.context_cache.render(products, limit=20)
+        return product_context.render_blocks(product_context.format_product_block(p) for p in products[:20])
+
+    def _user_section(self, user_profile):
+        """Prompt section describing the user: the cached behavior analysis if there is one, else the profile."""
+        user_analysis = None
+        if self.analysis_cache is not None and user_profile.get("user_id"):
+            user_analysis = self.analysis_cache.peek(user_profile["user_id"])
+        if user_analysis is not None:
+            return f"USER ANALYSIS:\n        {user_analysis}"
+        return f"USER PROFILE:\n        {prompt_builder.compact(user_profile)}"
+
+    @tracing.traced("explanation")
+    def generate_explanation(self, product_id, user_profile, recommendation_context):
+        """Generate a personalized explanation for why a product was recommended."""
+
+        user_section = self._user_section(user_profile)
+
+        prompt = prompt_builder.build("""
+        Generate a personalized explanation for why this product was recommended to this specific user:
+
+        {user_section}
+
+        PRODUCT RECOMMENDATION:
+        {recommendation_context}
+
+        Create a personalized explanation that:
+        1. Connects specific product features to the user's preferences or needs
+        2. References relevant past purchases or browsing behavior
+        3. Highlights how this product complements items they already own
+        4. Explains why this is the right time for this purchase
+        5. Adds a personal touch based on the user's demographics or interests
+
+        The explanation should feel tailored to this specific user, not generic.
+        """, self.prompt_budget, user_section=prompt_builder.Text(user_section),
+            recommendation_context=prompt_builder.Text(recommendation_context))
+        return llm_client.query_openai(prompt.text, client=self.client)
+
+    def iter_explanations(self, recommendation_contexts, user_profile, max_workers=5, single_call=False):
+        """
+        Yield (product_id, explanation) pairs as they complete, for a dict of
+        product_id -> recommendation context. With single_call=True one structured
+        request covers every product (anything it misses falls back to its own call).
+        A product whose call fails yields its exception in place of the explanation,
+        so one failure doesn't lose the others.
+        """
+        pending = dict(recommendation_contexts)
+        if single_call and pending:
+            for product_id, explanation in self._explain_in_one_call(pending, user_profile).items():
+                pending.pop(product_id)
+                yield product_id, explanation
+        if not pending:
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(tracing.bind(self.generate_explanation), product_id, user_profile, context): product_id
+                for product_id, context in pending.items()
+            }
+            for future in as_completed(futures):
+                try:
+                    explanation = future.result()
+                except Exception as e:
+                    explanation = e
+                yield futures[future], explanation
+
+    @tracing.traced("generate_explanations")
+    def generate_explanations(self, recommendation_contexts, user_profile, max_workers=5, single_call=False):
+        """Explanations for several recommended products, as a dict keyed by product id."""
+        explanations = dict(self.iter_explanations(recommendation_contexts, user_profile, max_workers, single_call))
+        for explanation in explanations.values():
+            if isinstance(explanation, Exception):
+                raise explanation
+        return {product_id: explanations[product_id] for product_id in recommendation_contexts}
+
+    @tracing.traced("explanations")
+    def _explain_in_one_call(self, recommendation_contexts, user_profile):
+        products = "\n".join(f"- {product_id}: {context}" for product_id, context in recommendation_contexts.items())
+        prompt = prompt_builder.build("""
+        Generate a personalized explanation for why each of these products was recommended to this specific user:
+
+        {user_section}
+
+        PRODUCT RECOMMENDATIONS (product_id: details):
+        {products}
+
+        For each product, create a personalized explanation that:
+        1. Connects specific product features to the user's preferences or needs
+        2. References relevant past purchases or browsing behavior
+        3. Highlights how this product complements items they already own
+        4. Explains why this is the right time for this purchase
+        5. Adds a personal touch based on the user's demographics or interests
+
+        Each explanation should feel tailored to this specific user, not generic.
+        """, self.prompt_budget, user_section=prompt_builder.Text(self._user_section(user_profile)),
+            products=prompt_builder.Text(products))
+        try:
+            answer = llm_client.query_openai_json(prompt.text, self.EXPLANATIONS_SCHEMA, name="explanations",
+                                                  client=self.client)
+        except ValueError:
+            return {}
+        return {
+            item["product_id"]: item["explanation"]
+            for item in answer["explanations"]
+            if item["product_id"] in recommendation_contexts
+        }
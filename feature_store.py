@@ -0,0 +1,159 @@
+"""
+Incremental per-user feature store for the fraud agents.
+
+Instead of rescanning the whole history on every transaction, each user keeps
+running aggregates that are updated in O(1) amortized time per event: a 24h
+deque for velocity, running sum/count and a monotonic deque for the max
+amount, and per location and merchant category the positions of its events
+in the window (their count, and the first one for ordering). Events older
+than 30 days are expired as newer ones arrive.
+
+`features()` returns the same dict as fraud_features.extract_features for a
+user whose events are added in timestamp order. Timestamps with a UTC offset
+are converted to naive UTC, so they compare with ones without.
+"""
+
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+import fraud_features
+
+VELOCITY_WINDOW = timedelta(hours=24)
+HISTORY_WINDOW = timedelta(days=30)
+
+
+def _parse(timestamp):
+    """An ISO string or datetime as a naive UTC datetime, so times with and without offsets compare."""
+    if not isinstance(timestamp, (str, datetime)):
+        raise TypeError(f"timestamp must be an ISO string or datetime, not {type(timestamp).__name__}")
+    return fraud_features.utc_naive(timestamp)
+
+
+def parse_event(transaction):
+    """(time, amount, location, category) of a transaction, validated so a bad record changes no state."""
+    time = _parse(transaction["timestamp"])
+    amount = transaction["amount"]
+    if isinstance(amount, bool) or not isinstance(amount, (int, float)):
+        raise TypeError(f"amount must be a number, not {type(amount).__name__}")
+    location = transaction["location"]
+    category = transaction["merchant_category"]
+    # Unhashable values would otherwise fail halfway through the counters
+    hash((location, category))
+    return time, amount, location, category
+
+
+def user_key(transaction):
+    """The transaction's user_id, which must be a string or number to key per-user state."""
+    user_id = transaction["user_id"]
+    if isinstance(user_id, bool) or not isinstance(user_id, (str, int, float)):
+        raise TypeError(f"user_id must be a string or number, not {type(user_id).__name__}")
+    return user_id
+
+
+class UserFeatures:
+    """Sliding-window aggregates for one user's transactions."""
+
+    def __init__(self, window=HISTORY_WINDOW):
+        self.window = window
+        self.events = deque()  # (time, amount, location, category), oldest first
+        self.recent = deque()  # times inside the 24h window
+        self.max_amounts = deque()  # (time, amount), amounts strictly decreasing
+        self.amount_sum = 0.0
+        # value -> numbers of its events in the window, oldest first; the first one orders the features
+        # like extract_features (by first occurrence in the window)
+        self.locations = {}
+        self.categories = {}
+        # dict as an ordered set: iteration order must not depend on the per-process string hash seed
+        self.common_locations = {}
+        self._added = 0
+
+    def add(self, transaction):
+        """Record a transaction (timestamps must not go backwards). An invalid one raises and is not recorded."""
+        # Everything that can fail happens here; the updates below always complete
+        time, amount, location, category = parse_event(transaction)
+
+        self.events.append((time, amount, location, category))
+        self.recent.append(time)
+        self.amount_sum += amount
+        while self.max_amounts and self.max_amounts[-1][1] <= amount:
+            self.max_amounts.pop()
+        self.max_amounts.append((time, amount))
+        seen = self.locations.setdefault(location, deque())
+        seen.append(self._added)
+        if len(seen) == 2:
+            self.common_locations[location] = None
+        self.categories.setdefault(category, deque()).append(self._added)
+        self._added += 1
+        self.expire(time)
+
+    def expire(self, now):
+        """Drop events older than the history window and times outside the 24h window."""
+        cutoff = now - self.window
+        while self.events and self.events[0][0] < cutoff:
+            time, amount, location, category = self.events.popleft()
+            self.amount_sum -= amount
+            if self.max_amounts and self.max_amounts[0][0] == time and self.max_amounts[0][1] == amount:
+                self.max_amounts.popleft()
+            seen = self.locations[location]
+            seen.popleft()
+            if len(seen) == 1:
+                self.common_locations.pop(location, None)
+            elif not seen:
+                del self.locations[location]
+            seen = self.categories[category]
+            seen.popleft()
+            if not seen:
+                del self.categories[category]
+        recent_cutoff = now - VELOCITY_WINDOW
+        while self.recent and self.recent[0] < recent_cutoff:
+            self.recent.popleft()
+
+    def features(self, timestamp=None) -> dict:
+        """Features for a transaction at `timestamp` (defaults to the latest event)."""
+        if timestamp is not None:
+            self.expire(_parse(timestamp))
+        count = len(self.events)
+        return {
+            "avg_transaction_amount": self.amount_sum / count if count else 0,
+            "transaction_velocity_24h": len(self.recent),
+            "common_locations": sorted(self.common_locations, key=lambda location: self.locations[location][0]),
+            "usual_merchant_categories": sorted(self.categories, key=lambda category: self.categories[category][0]),
+            "transaction_count_30d": count,
+            "highest_single_amount": self.max_amounts[0][1] if self.max_amounts else 0,
+        }
+
+
+class FeatureStore:
+    """UserFeatures per user id, safe to share between threads."""
+
+    def __init__(self, window=HISTORY_WINDOW):
+        self.window = window
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def add(self, user_id, transaction):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                user = self._users[user_id] = UserFeatures(self.window)
+            user.add(transaction)
+
+    def load_history(self, user_id, history):
+        """Seed a user from an existing history list (any order)."""
+        for transaction in sorted(history, key=lambda tx: _parse(tx["timestamp"])):
+            self.add(user_id, transaction)
+
+    def features(self, user_id, timestamp=None) -> dict:
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                # Unknown users get empty features without being stored
+                return UserFeatures(self.window).features()
+            return user.features(timestamp)
+
+    def __contains__(self, user_id):
+        return user_id in self._users
+
+    def __len__(self):
+        return len(self._users)
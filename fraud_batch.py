@@ -0,0 +1,212 @@
+"""
+Multi-transaction batch prompting for fraud scoring.
+
+Packs many transactions into one request: the instructions appear once, each
+user's history summary appears once, and every transaction is listed under
+its user with an id. A batch holds only as many transactions as fit the
+prompt token budget; the rest go into the next one. The model must answer
+with a JSON array keyed by transaction id; any item that is missing or fails
+to parse falls back to a single `analyze_transaction` call.
+"""
+
+import json
+import re
+
+import prompt_builder
+import tokens
+
+# Features that do not depend on the transaction being scored
+USER_SUMMARY_KEYS = (
+    "avg_transaction_amount",
+    "common_locations",
+    "usual_merchant_categories",
+    "transaction_count_30d",
+    "highest_single_amount",
+)
+
+
+def _first_present(*values):
+    # `is None`, not truthiness: 0 and "" are valid ids
+    return next((value for value in values if value is not None), None)
+
+
+def _transaction_id(item, index):
+    return str(_first_present(item.get("transaction_id"), item["transaction"].get("transaction_id"), index))
+
+
+def _user_id(item):
+    return _first_present(item.get("user_id"), item["transaction"].get("user_id"))
+
+
+BATCH_TEMPLATE = """Analyze each financial transaction below for potential fraud.
+For every transaction consider location patterns, amount vs. the user's typical spending,
+merchant category vs. usual habits, and timing/frequency (transaction_velocity_24h).
+
+{transactions}
+
+Respond with ONLY a JSON array, one object per transaction, in this format:
+[{{"transaction_id": "<id>", "fraud_risk_score": <0-100>, "risk_level": "<Low|Medium|High>", "explanation": "..."}}]
+"""
+
+
+class BatchTransactions(prompt_builder.History):
+    """
+    The transactions of one batch listed under their user's summary. Items are
+    (group_key, user_id, summary, entry) in group order; `fit` keeps the longest
+    prefix that fits (always at least one), and the caller sends the rest later.
+    """
+
+    def fit(self, allowance):
+        sections, used, current = [], 0, None
+        for key, user_id, summary, entry in self.items:
+            line = prompt_builder.compact(entry)
+            cost = tokens.estimate_tokens(line) + 1
+            header = None
+            if key != current:
+                header = f"USER {user_id} HISTORY SUMMARY:\n{prompt_builder.compact(summary)}\nTRANSACTIONS:"
+                cost += tokens.estimate_tokens(header) + 2
+            if sections and used + cost > allowance:
+                break
+            if header is not None:
+                sections.append([header])
+                current = key
+            sections[-1].append(line)
+            used += cost
+        kept = sum(len(lines) - 1 for lines in sections)
+        text = "\n\n".join("\n".join(lines) for lines in sections)
+        used = tokens.estimate_tokens(text)
+        return text, used, {"items": len(self.items), "kept": kept, "tokens": used}
+
+
+def build_batch_prompt(groups, budget=prompt_builder.DEFAULT_BUDGET) -> prompt_builder.Prompt:
+    """
+    groups: list of (user_id, summary, [(transaction_id, transaction, velocity_24h), ...]).
+    The prompt lists as many transactions as fit `budget`; its report's
+    "transactions" entry says how many ("kept"), in group order.
+    """
+    items = []
+    for key, (user_id, summary, transactions) in enumerate(groups):
+        for transaction_id, transaction, velocity in transactions:
+            entry = {**transaction, "transaction_id": transaction_id, "transaction_velocity_24h": velocity}
+            items.append((key, user_id, summary, entry))
+    return prompt_builder.build(BATCH_TEMPLATE, budget, transactions=BatchTransactions(items))
+
+
+def _report(entry):
+    """A normalized report from one parsed answer object, or None if it has no valid score."""
+    if not isinstance(entry, dict):
+        return None
+    try:
+        score = float(entry["fraud_risk_score"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    if not 0 <= score <= 100:
+        return None
+    return {"fraud_risk_score": score, "risk_level": entry.get("risk_level"),
+            "explanation": entry.get("explanation", "")}
+
+
+def parse_report(text):
+    """The fraud report in a single-transaction answer (a JSON object, possibly inside prose), or None."""
+    match = re.search(r"\{.*\}", text, re.S)
+    if not match:
+        return None
+    try:
+        return _report(json.loads(match.group(0)))
+    except ValueError:
+        return None
+
+
+def text_report(text) -> dict:
+    """parse_report(text), or a report without a score whose explanation is the whole text."""
+    report = parse_report(text)
+    if report is None:
+        return {"fraud_risk_score": None, "risk_level": None, "explanation": text}
+    return report
+
+
+def agent_report(result) -> dict:
+    """
+    The fraud_report dict of an LLM agent's result: the agents return a dict, a JSON
+    string ("fraud_report") or free text ("analysis"). Unparseable text becomes the explanation.
+    """
+    report = result.get("fraud_report")
+    if isinstance(report, dict):
+        return report
+    return text_report(report if isinstance(report, str) else result.get("analysis") or "")
+
+
+def parse_batch_response(text, expected_ids) -> dict:
+    """Map transaction id -> report for every well-formed entry in the model's JSON array."""
+    match = re.search(r"\[.*\]", text, re.S)
+    if not match:
+        return {}
+    try:
+        entries = json.loads(match.group(0))
+    except ValueError:
+        return {}
+
+    reports = {}
+    for entry in entries if isinstance(entries, list) else []:
+        report = _report(entry)
+        if report is not None and str(entry.get("transaction_id")) in expected_ids:
+            reports[str(entry.get("transaction_id"))] = report
+    return reports
+
+
+def analyze_batch(agent, items, query, batch_size=20, budget=prompt_builder.DEFAULT_BUDGET) -> list:
+    """
+    Score `items` (dicts with "transaction", "user_history" and optional
+    "transaction_id"/"user_id") with one `query(prompt)` call per batch of at
+    most `batch_size` transactions and `budget` prompt tokens. Results come back
+    in input order, each with "transaction_id", "fraud_report" and "features".
+    """
+    prepared = []
+    seen_ids = set()
+    for index, item in enumerate(items):
+        features = agent._extract_features(item["transaction"], item.get("user_history"))
+        transaction_id = _transaction_id(item, index)
+        if transaction_id in seen_ids:
+            transaction_id = f"{transaction_id}#{index}"
+        seen_ids.add(transaction_id)
+        prepared.append((transaction_id, _user_id(item), item, features))
+
+    # Keep each user's transactions together so their summary is sent once per batch
+    pending = sorted(range(len(prepared)), key=lambda i: str(prepared[i][1]))
+    results = [None] * len(prepared)
+    while pending:
+        groups = {}
+        for i in pending[:batch_size]:
+            transaction_id, user_id, item, features = prepared[i]
+            summary = {key: features[key] for key in USER_SUMMARY_KEYS}
+            # A user whose history changed between transactions gets one group per distinct summary
+            key = (user_id, json.dumps(summary, sort_keys=True))
+            if key not in groups:
+                groups[key] = (user_id, summary, [], [])
+            groups[key][2].append((transaction_id, item["transaction"], features["transaction_velocity_24h"]))
+            groups[key][3].append(i)
+
+        prompt = build_batch_prompt([group[:3] for group in groups.values()], budget)
+        # Whatever did not fit the budget goes into the next batch
+        batch = [i for group in groups.values() for i in group[3]][:prompt.report["transactions"]["kept"]]
+        sent = set(batch)
+        pending = [i for i in pending if i not in sent]
+
+        expected = {prepared[i][0] for i in batch}
+        # Backend errors (auth, rate limits, network) propagate: falling back to one call per
+        # transaction would multiply traffic just when the provider is failing
+        text = query(prompt.text)
+        try:
+            reports = parse_batch_response(text, expected)
+        except (json.JSONDecodeError, KeyError, TypeError):
+            reports = {}
+
+        for i in batch:
+            transaction_id, user_id, item, features = prepared[i]
+            if transaction_id in reports:
+                report = reports[transaction_id]
+            else:
+                # Fall back to a single call for anything the batch answer did not cover
+                report = agent_report(agent.analyze_transaction(item["transaction"], item.get("user_history")))
+            results[i] = {"transaction_id": transaction_id, "fraud_report": report, "features": features}
+    return results
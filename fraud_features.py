@@ -0,0 +1,137 @@
+"""
+Shared feature extraction for the fraud agents.
+
+`extract_features` is the single-transaction version used by the agents'
+`_extract_features` and returns the same dict as the original per-agent code.
+It also accepts a history already in columnar form (`HistoryColumns`, e.g. a
+zero-copy slice from history_store.HistoryStore) and then never builds
+per-transaction dicts. NumPy is only imported by the columnar functions, so
+importing an agent (which only needs extract_features) stays cheap.
+"""
+
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import records
+
+VELOCITY_WINDOW = timedelta(hours=24)
+
+
+def extract_features(transaction, history):
+    """Extract relevant features from transaction history (linear in len(history))."""
+    if isinstance(history, HistoryColumns):
+        return columns_features(transaction, history)
+    if all(type(tx) is records.Transaction for tx in history):
+        # Attribute reads skip the Mapping protocol, and the timestamps are already parsed
+        amounts = [tx.amount for tx in history]
+        locations = [tx.location for tx in history]
+        categories = [tx.merchant_category for tx in history]
+        times = [tx.timestamp for tx in history]
+    else:
+        amounts = [tx["amount"] for tx in history]
+        locations = [tx["location"] for tx in history]
+        categories = [tx["merchant_category"] for tx in history]
+        times = [tx["timestamp"] for tx in history]
+    avg_amount = sum(amounts) / len(amounts) if amounts else 0
+
+    location_counts = Counter(locations)
+    common_locations = [loc for loc, count in location_counts.items() if count > 1]
+
+    # Calculate transaction velocity (# of transactions in last 24 hours)
+    recent_count = 0
+    if history:
+        current_time = utc_naive(transaction["timestamp"])
+        for tx_time in times:
+            if current_time - utc_naive(tx_time) <= VELOCITY_WINDOW:
+                recent_count += 1
+
+    return {
+        "avg_transaction_amount": avg_amount,
+        "transaction_velocity_24h": recent_count,
+        "common_locations": common_locations,
+        "usual_merchant_categories": list(dict.fromkeys(categories)),
+        "transaction_count_30d": len(history),
+        "highest_single_amount": max(amounts) if amounts else 0,
+    }
+
+
+def utc_naive(timestamp):
+    """An ISO-8601 string or datetime as a naive datetime; one with a UTC offset is converted to UTC first."""
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def _has_offset(timestamp) -> bool:
+    if isinstance(timestamp, str):
+        # Anything after the date that carries a sign or "Z" is an offset, e.g. "2025-04-19T03:45:00+02:00"
+        return timestamp.endswith(("Z", "z")) or "+" in timestamp[10:] or "-" in timestamp[10:]
+    return getattr(timestamp, "tzinfo", None) is not None
+
+
+def to_datetime64(timestamps):
+    """
+    Parse ISO-8601 strings (or datetimes) into a datetime64[us] array in one pass.
+    datetime64 has no time zone, so values with an offset are converted to UTC.
+    """
+    import numpy as np
+
+    try:
+        joined = "\n".join(timestamps)
+    except TypeError:
+        joined = None  # not all strings
+    # Every ISO string has two "-" in its date; more, a "+" or a "Z" means some carry an offset
+    if joined is not None and not ("+" in joined or "Z" in joined or "z" in joined
+                                   or joined.count("-") > 2 * len(timestamps)):
+        return np.array(timestamps, dtype="datetime64[us]")
+    return np.array([utc_naive(t) if _has_offset(t) else t for t in timestamps], dtype="datetime64[us]")
+
+
+class HistoryColumns:
+    """Many user histories packed end to end as columns; `offsets[i]:offsets[i+1]` is history i."""
+
+    def __init__(self, timestamps, amounts, location_codes, category_codes, offsets, locations, categories):
+        self.timestamps = timestamps  # datetime64[us]
+        self.amounts = amounts  # float64
+        self.location_codes = location_codes  # integer index into self.locations
+        self.category_codes = category_codes  # integer index into self.categories
+        self.offsets = offsets  # int64, len(histories) + 1
+        self.locations = locations
+        self.categories = categories
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+def _codes_by_first_seen(codes, n_codes, min_count=1):
+    """Distinct codes occurring at least min_count times, in order of first occurrence."""
+    import numpy as np
+
+    keep = np.flatnonzero(np.bincount(codes, minlength=n_codes) >= min_count)
+    # Assigning positions in reverse leaves each code's first position (the last write wins)
+    first = np.empty(n_codes, dtype=np.int64)
+    first[codes[::-1]] = np.arange(len(codes) - 1, -1, -1)
+    return keep[np.argsort(first[keep], kind="stable")]
+
+
+def columns_features(transaction, columns: HistoryColumns) -> dict:
+    """extract_features for one history given as columns (all rows of `columns` are the history)."""
+    import numpy as np
+
+    amounts = columns.amounts
+    if not len(amounts):
+        return extract_features(transaction, [])
+    now = np.datetime64(utc_naive(transaction["timestamp"]), "us")
+    recent = now - columns.timestamps <= np.timedelta64(VELOCITY_WINDOW)
+    common = _codes_by_first_seen(columns.location_codes, len(columns.locations), 2)
+    categories = _codes_by_first_seen(columns.category_codes, len(columns.categories))
+    return {
+        "avg_transaction_amount": float(amounts.mean()),
+        "transaction_velocity_24h": int(np.count_nonzero(recent)),
+        "common_locations": [columns.locations[c] for c in common],
+        "usual_merchant_categories": [columns.categories[c] for c in categories],
+        "transaction_count_30d": len(amounts),
+        "highest_single_amount": float(amounts.max()),
+    }
@@ -0,0 +1,120 @@
+"""
+Deterministic rule-based pre-screen in front of the LLM fraud agents.
+
+`score_transaction` turns the `_extract_features` output into a 0-100 risk
+score plus a confidence, in microseconds. `PreScreenedFraudAgent` decides
+clear-cut low- and high-risk transactions locally and only escalates the
+ambiguous band to the wrapped LLM agent. Either way the result has a
+"fraud_report" dict (fraud_risk_score, risk_level, explanation), "prescreen"
+and "features"; escalated results also keep the agent's other keys.
+"""
+
+import threading
+
+import fraud_batch
+
+
+def _ramp(value, start, end):
+    """0 at `start`, 1 at `end`, linear in between."""
+    if value <= start:
+        return 0.0
+    if value >= end:
+        return 1.0
+    return (value - start) / (end - start)
+
+
+def score_transaction(transaction, features, min_history=5) -> dict:
+    """Local fraud risk score (0-100) with a confidence (0-1) and the reasons behind it."""
+    amount = transaction["amount"]
+    avg_amount = features["avg_transaction_amount"]
+    history_size = features["transaction_count_30d"]
+    reasons = []
+    score = 0.0
+
+    # Amount vs. the user's typical and largest spend
+    if avg_amount:
+        ratio = amount / avg_amount
+        points = 35 * _ramp(ratio, 2, 10)
+        if points:
+            reasons.append(f"amount is {ratio:.1f}x the average")
+        score += points
+    if history_size and amount > features["highest_single_amount"]:
+        score += 15
+        reasons.append("amount exceeds the highest previous transaction")
+
+    # 24h velocity
+    velocity = features["transaction_velocity_24h"]
+    points = 15 * _ramp(velocity, 3, 10)
+    if points:
+        reasons.append(f"{velocity} transactions in the last 24h")
+    score += points
+
+    # Unseen location and merchant category
+    if history_size and transaction["location"] not in features["common_locations"]:
+        score += 20
+        reasons.append(f"unusual location {transaction['location']}")
+    if history_size and transaction["merchant_category"] not in features["usual_merchant_categories"]:
+        score += 15
+        reasons.append(f"new merchant category {transaction['merchant_category']}")
+
+    return {
+        "fraud_risk_score": round(min(score, 100.0)),
+        "confidence": min(1.0, history_size / min_history) if min_history else 1.0,
+        "reasons": reasons,
+    }
+
+
+def risk_level(score) -> str:
+    if score >= 70:
+        return "High"
+    if score >= 30:
+        return "Medium"
+    return "Low"
+
+
+class PreScreenedFraudAgent:
+    """Decide clear cases locally, escalate the ambiguous band to `agent.analyze_transaction`."""
+
+    def __init__(self, agent, low_threshold=20, high_threshold=80, min_confidence=0.6, min_history=5):
+        self.agent = agent
+        self.low_threshold = low_threshold
+        self.high_threshold = high_threshold
+        self.min_confidence = min_confidence
+        self.min_history = min_history
+        self.counters = {"low": 0, "high": 0, "escalated": 0}
+        self._lock = threading.Lock()
+
+    def prescreen(self, transaction, user_history=None) -> dict:
+        """Local score plus the tier it falls in: "low", "high" or "escalated"."""
+        features = self.agent._extract_features(transaction, user_history)
+        result = score_transaction(transaction, features, self.min_history)
+        if result["confidence"] < self.min_confidence:
+            tier = "escalated"
+        elif result["fraud_risk_score"] < self.low_threshold:
+            tier = "low"
+        elif result["fraud_risk_score"] >= self.high_threshold:
+            tier = "high"
+        else:
+            tier = "escalated"
+        return {**result, "tier": tier, "features": features}
+
+    def analyze_transaction(self, transaction, user_history=None):
+        screen = self.prescreen(transaction, user_history)
+        features = screen.pop("features")
+        with self._lock:
+            self.counters[screen["tier"]] += 1
+
+        if screen["tier"] == "escalated":
+            result = self.agent.analyze_transaction(transaction, user_history, features=features)
+            return {**result, "fraud_report": fraud_batch.agent_report(result), "prescreen": screen,
+                    "features": features}
+
+        return {
+            "fraud_report": {
+                "fraud_risk_score": screen["fraud_risk_score"],
+                "risk_level": risk_level(screen["fraud_risk_score"]),
+                "explanation": "; ".join(screen["reasons"]) or "matches the user's usual pattern",
+            },
+            "prescreen": screen,
+            "features": features,
+        }
@@ -0,0 +1,220 @@
+"""
+Memory-mapped columnar transaction history for the fraud agents.
+
+Histories as lists of dicts cost hundreds of bytes per transaction on the
+Python heap and re-parse ISO timestamps on every feature extraction. A
+HistoryStore keeps them on disk as NumPy .npy columns, one row per
+transaction, grouped by user and in time order within each user:
+
+    timestamps.npy       int64 epoch microseconds
+    amounts.npy          float64
+    location_codes.npy   int32 index into dictionaries.json "locations"
+    category_codes.npy   int32 index into "merchant_categories"
+    merchant_codes.npy   int32 index into "merchants"
+    user_ids.npy         sorted user ids (fixed-width UTF-8 bytes)
+    offsets.npy          int64; user i's rows are offsets[i]:offsets[i + 1]
+
+Opening a store memory-maps the columns (only the small dictionaries are
+read), so the OS pages in just the users that are looked up, and many
+processes share one copy. `history(user_id, before=...)` returns a
+fraud_features.HistoryColumns whose arrays are views of the mapped files, and
+extract_features consumes it without building any dicts. The store also
+works as the agents' `feature_store`:
+
+    history_store.build("histories/", transactions)
+    agent = FraudDetectionAgent(feature_store=history_store.HistoryStore("histories/"))
+    agent.analyze_transaction(transaction)  # history read from the store
+
+    python history_store.py transactions.jsonl histories/
+"""
+
+import argparse
+import json
+import os
+import sys
+from array import array
+from datetime import timedelta
+
+import numpy as np
+
+import feature_store
+import fraud_features
+
+HISTORY_WINDOW = timedelta(days=30)
+COLUMNS = ("timestamps", "amounts", "location_codes", "category_codes", "merchant_codes", "user_ids", "offsets")
+REQUIRED_FIELDS = {"user_id", "timestamp", "amount", "location", "merchant_category"}
+# Timestamps are parsed this many at a time while building
+PARSE_CHUNK = 100_000
+
+
+def build(path, transactions) -> "HistoryStore":
+    """Write a store for an iterable of transaction dicts (any order) to directory `path` and open it."""
+    users, dictionaries = {}, {"locations": {}, "merchant_categories": {}, "merchants": {}}
+    timestamps, pending = array("q"), []
+    amounts = array("d")
+    user_codes, location_codes, category_codes, merchant_codes = array("i"), array("i"), array("i"), array("i")
+
+    def flush():
+        timestamps.extend(fraud_features.to_datetime64(pending).astype(np.int64).tolist())
+        pending.clear()
+
+    for transaction in transactions:
+        pending.append(transaction["timestamp"])
+        if len(pending) >= PARSE_CHUNK:
+            flush()
+        amounts.append(transaction["amount"])
+        user_codes.append(users.setdefault(str(transaction["user_id"]), len(users)))
+        location_codes.append(dictionaries["locations"].setdefault(
+            transaction["location"], len(dictionaries["locations"])))
+        category_codes.append(dictionaries["merchant_categories"].setdefault(
+            transaction["merchant_category"], len(dictionaries["merchant_categories"])))
+        merchant_codes.append(dictionaries["merchants"].setdefault(
+            transaction.get("merchant", ""), len(dictionaries["merchants"])))
+    flush()
+
+    # Rank users by their encoded id so lookups can binary-search user_ids.npy
+    user_ids = np.array([user_id.encode("utf-8") for user_id in users]) if users else np.array([], dtype="S1")
+    by_id = np.argsort(user_ids, kind="stable")
+    rank = np.empty(len(users), dtype=np.int64)
+    rank[by_id] = np.arange(len(users))
+    user_rank = rank[np.frombuffer(user_codes, dtype=np.int32)] if users else np.array([], dtype=np.int64)
+    timestamps = np.frombuffer(timestamps, dtype=np.int64)
+    order = np.lexsort((timestamps, user_rank))
+
+    os.makedirs(path, exist_ok=True)
+    columns = {
+        "timestamps": timestamps[order],
+        "amounts": np.frombuffer(amounts, dtype=np.float64)[order] if amounts else np.array([], dtype=np.float64),
+        "location_codes": np.frombuffer(location_codes, dtype=np.int32)[order],
+        "category_codes": np.frombuffer(category_codes, dtype=np.int32)[order],
+        "merchant_codes": np.frombuffer(merchant_codes, dtype=np.int32)[order],
+        "user_ids": user_ids[by_id],
+        "offsets": np.concatenate(([0], np.cumsum(np.bincount(user_rank, minlength=len(users))))).astype(np.int64),
+    }
+    for name, values in columns.items():
+        np.save(os.path.join(path, f"{name}.npy"), values)
+    # Written last: a store with dictionaries.json is complete
+    with open(os.path.join(path, "dictionaries.json"), "w", encoding="utf-8") as f:
+        json.dump({name: list(codes) for name, codes in dictionaries.items()}, f, ensure_ascii=False)
+    return HistoryStore(path)
+
+
+class HistoryStore:
+    """Read-only, memory-mapped view of a store written by `build`."""
+
+    def __init__(self, path, window=HISTORY_WINDOW):
+        self.path = path
+        self.window = window
+        with open(os.path.join(path, "dictionaries.json"), encoding="utf-8") as f:
+            dictionaries = json.load(f)
+        self.locations = dictionaries["locations"]
+        self.categories = dictionaries["merchant_categories"]
+        self.merchants = dictionaries["merchants"]
+        # Plain ndarray views of the mappings: still zero-copy, without np.memmap's per-operation overhead
+        columns = {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")) for name in COLUMNS}
+        # Same bytes, read as datetime64 so slices compare directly with transaction times
+        self.timestamps = columns["timestamps"].view("datetime64[us]")
+        self.amounts = columns["amounts"]
+        self.location_codes = columns["location_codes"]
+        self.category_codes = columns["category_codes"]
+        self.merchant_codes = columns["merchant_codes"]
+        self.user_ids = columns["user_ids"]
+        self.offsets = columns["offsets"]
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return self._rows(user_id) is not None
+
+    def _rows(self, user_id):
+        """(start, stop) of the user's rows, or None for an unknown user."""
+        key = str(user_id).encode("utf-8")
+        i = int(np.searchsorted(self.user_ids, key))
+        if i < len(self.user_ids) and self.user_ids[i] == key:
+            return int(self.offsets[i]), int(self.offsets[i + 1])
+        return None
+
+    def _bounds(self, user_id, before, window):
+        start, stop = self._rows(user_id) or (0, 0)
+        if before is not None and stop > start:
+            end = np.datetime64(fraud_features.utc_naive(before), "us")
+            times = self.timestamps[start:stop]
+            # Rows are in time order within a user
+            stop = start + int(np.searchsorted(times, end, side="left"))
+            start += int(np.searchsorted(times, end - np.timedelta64(window or self.window), side="left"))
+        return start, stop
+
+    def history(self, user_id, before=None, window=None) -> fraud_features.HistoryColumns:
+        """
+        The user's transactions as zero-copy columns. With `before` (ISO string or
+        datetime), only those strictly before it and within `window` (default: the
+        store's 30 days) of it, i.e. the history a transaction at `before` is scored on.
+        """
+        start, stop = self._bounds(user_id, before, window)
+        return fraud_features.HistoryColumns(
+            self.timestamps[start:stop],
+            self.amounts[start:stop],
+            self.location_codes[start:stop],
+            self.category_codes[start:stop],
+            np.array([0, stop - start], dtype=np.int64),
+            self.locations,
+            self.categories,
+        )
+
+    def to_dicts(self, user_id, before=None, window=None) -> list:
+        """The same history as transaction dicts (for prompts or code that expects the list form)."""
+        start, stop = self._bounds(user_id, before, window)
+        rows = zip(self.timestamps[start:stop].tolist(), self.amounts[start:stop].tolist(),
+                   self.merchant_codes[start:stop].tolist(), self.category_codes[start:stop].tolist(),
+                   self.location_codes[start:stop].tolist())
+        return [
+            {"timestamp": timestamp.isoformat(), "amount": amount, "merchant": self.merchants[merchant],
+             "merchant_category": self.categories[category], "location": self.locations[location]}
+            for timestamp, amount, merchant, category, location in rows
+        ]
+
+    def features(self, user_id, timestamp) -> dict:
+        """extract_features for a transaction of `user_id` at `timestamp`, like FeatureStore.features."""
+        return fraud_features.extract_features({"timestamp": timestamp}, self.history(user_id, before=timestamp))
+
+
+def read_transactions(lines, skipped):
+    """
+    Parsed transaction dicts from JSONL lines; line numbers of unusable lines (bad JSON,
+    missing fields, an unparseable timestamp or a non-numeric amount) are appended to `skipped`.
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            transaction = json.loads(line)
+            if not isinstance(transaction, dict) or not REQUIRED_FIELDS <= transaction.keys():
+                raise ValueError("missing fields")
+            feature_store.parse_event(transaction)
+        except (TypeError, ValueError):
+            skipped.append(line_number)
+            continue
+        yield transaction
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a memory-mapped history store from JSONL transactions.")
+    parser.add_argument("input", help="JSONL file of transactions ('-' for stdin)")
+    parser.add_argument("path", help="directory to write the store to")
+    args = parser.parse_args(argv)
+
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    skipped = []
+    try:
+        store = build(args.path, read_transactions(infile, skipped))
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+    print(f"Stored {int(store.offsets[-1])} transactions for {len(store)} users in {args.path}", file=sys.stderr)
+    if skipped:
+        print(f"Skipped {len(skipped)} unusable lines (first: line {skipped[0]})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
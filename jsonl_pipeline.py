@@ -0,0 +1,100 @@
+"""
+Ordered, bounded JSONL processing shared by the command-line runners
+(transaction_stream and `python -m cot_agents`).
+
+`process` hands each record to a thread pool and writes one JSON result per
+line in input order. Only `max_pending` records are in flight at once, so
+reading blocks while the workers fall behind and a large file is never
+loaded whole. `add_arguments` and `opened` give the runners the same input,
+output, concurrency and scheduling options.
+"""
+
+import contextlib
+import json
+import sys
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import llm_client
+import llm_scheduler
+import tracing
+
+
+def read_objects(lines):
+    """Yield (line_number, dict or None, error or None) for each non-blank line."""
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("each line must be a JSON object")
+        except ValueError as e:
+            yield line_number, None, str(e)
+            continue
+        yield line_number, record, None
+
+
+def process(records, work, out, workers=4, max_pending=64, default=str) -> int:
+    """
+    For each (line_number, record, error) in `records`, write work(line_number, record)
+    (run in a pool thread) or {"line": n, "error": error} to `out` as JSONL, in input
+    order; `default` serializes what json cannot. Returns the count written.
+    """
+    pending = deque()
+    written = 0
+
+    def write_oldest():
+        out.write(json.dumps(pending.popleft().result(), default=default) + "\n")
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for line_number, record, error in records:
+            if error is not None:
+                failed = Future()
+                failed.set_result({"line": line_number, "error": error})
+                pending.append(failed)
+            else:
+                pending.append(pool.submit(tracing.bind(work), line_number, record))
+            # Backpressure: stop reading until the oldest result is written
+            while len(pending) >= max_pending:
+                write_oldest()
+                written += 1
+        while pending:
+            write_oldest()
+            written += 1
+    out.flush()
+    return written
+
+
+def add_arguments(parser, what="records"):
+    """Input/output, concurrency and LLM scheduling options (see `opened`)."""
+    parser.add_argument("input", nargs="?", default="-", help=f"JSONL file of {what} ('-' for stdin)")
+    parser.add_argument("-o", "--output", default="-", help="where to write JSONL results ('-' for stdout)")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-pending", type=int, default=64)
+    parser.add_argument("--priority", choices=sorted(llm_scheduler.PRIORITIES), default="batch",
+                        help="scheduling class of this run's LLM calls")
+    parser.add_argument("--requests-per-minute", type=int, default=None, help="provider request rate limit")
+    parser.add_argument("--tokens-per-minute", type=int, default=None, help="provider token rate limit")
+
+
+@contextlib.contextmanager
+def opened(args):
+    """
+    Yield (infile, outfile) for the parsed `add_arguments` options, with the run's
+    rate limits installed and its LLM calls at args.priority; closes the files.
+    """
+    if args.requests_per_minute or args.tokens_per_minute:
+        llm_client.scheduler = llm_scheduler.Scheduler(args.requests_per_minute, args.tokens_per_minute)
+    infile = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    try:
+        outfile = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        try:
+            with llm_scheduler.priority(args.priority):
+                yield infile, outfile
+        finally:
+            if outfile is not sys.stdout:
+                outfile.close()
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
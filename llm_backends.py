@@ -0,0 +1,341 @@
+"""
+LLM backends behind one interface (sync and async).
+
+`OpenAIBackend` and `OllamaBackend` wrap the real SDK clients. `FakeBackend`
+returns canned or templated responses with configurable latency, jitter,
+token rate and error injection, so agent throughput and concurrency can be
+load-tested offline; it can also simulate a provider prefix cache. Any backend can be passed to an agent as its `client`
+(or installed with llm_client.set_openai_client / set_ollama_client).
+"""
+
+import asyncio
+import json
+import os
+import random
+import string
+import threading
+import time
+
+import tokens
+
+
+class LLMBackend:
+    """
+    Interface every backend implements (override generate or generate_with_usage).
+    `schema` asks for a JSON object matching it.
+    """
+
+    name = "base"
+    default_model = None
+
+    def generate(self, prompt: str, model=None, schema=None, schema_name="result") -> str:
+        return self.generate_with_usage(prompt, model, schema, schema_name)[0]
+
+    def generate_with_usage(self, prompt: str, model=None, schema=None, schema_name="result"):
+        """(text, usage): usage has prompt_tokens, completion_tokens and cached_tokens, or is None if unknown."""
+        if type(self).generate is LLMBackend.generate:
+            # Each default is written in terms of the other
+            raise TypeError(f"{type(self).__name__} must override generate or generate_with_usage")
+        return self.generate(prompt, model, schema, schema_name), None
+
+    def cache_identity(self) -> str:
+        """Who answers, for response cache keys: backends that can answer differently must differ here."""
+        return self.name
+
+    def stream(self, prompt: str, model=None):
+        """Yield text chunks; the default yields the whole response at once."""
+        yield self.generate(prompt, model)
+
+    async def agenerate(self, prompt: str, model=None, schema=None, schema_name="result") -> str:
+        return (await self.agenerate_with_usage(prompt, model, schema, schema_name))[0]
+
+    async def agenerate_with_usage(self, prompt: str, model=None, schema=None, schema_name="result"):
+        """generate_with_usage for coroutines; by default it runs in a worker thread."""
+        if type(self).agenerate is not LLMBackend.agenerate:
+            return await self.agenerate(prompt, model, schema, schema_name), None
+        return await asyncio.to_thread(self.generate_with_usage, prompt, model, schema, schema_name)
+
+    async def astream(self, prompt: str, model=None):
+        yield await self.agenerate(prompt, model)
+
+
+def _client_identity(client) -> str:
+    """An SDK client's class and endpoint (openai keeps base_url on the client, ollama on its httpx client)."""
+    base_url = getattr(client, "base_url", None) or getattr(getattr(client, "_client", None), "base_url", None)
+    return f"{type(client).__module__}.{type(client).__qualname__}@{base_url or ''}"
+
+
+class OpenAIBackend(LLMBackend):
+    """Responses API through a (shared) OpenAI client."""
+
+    name = "openai"
+    default_model = "gpt-4o-mini"
+
+    def __init__(self, client=None, async_client=None):
+        self.client = client
+        self.async_client = async_client
+        # Without a client, the shared one built by llm_client is used (and filled in lazily)
+        self._injected = client is not None
+
+    def cache_identity(self):
+        return f"{self.name}:{_client_identity(self.client)}" if self._injected else self.name
+
+    def _client(self):
+        if self.client is None:
+            import llm_client
+            self.client = llm_client.get_openai_client()
+        return self.client
+
+    def _async_client(self):
+        if self.async_client is None:
+            # Not stored: the shared async client belongs to the running event loop
+            import llm_client
+            return llm_client.get_async_openai_client()
+        return self.async_client
+
+    def _request(self, prompt, model, schema, schema_name="result"):
+        request = {"model": model or self.default_model, "input": prompt, "temperature": 0}
+        if schema is not None:
+            request["text"] = {"format": {"type": "json_schema", "name": schema_name, "schema": schema, "strict": True}}
+        return request
+
+    @staticmethod
+    def _usage(response):
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return None
+        details = getattr(usage, "input_tokens_details", None)
+        return {
+            "prompt_tokens": usage.input_tokens,
+            "completion_tokens": usage.output_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        }
+
+    def generate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        response = self._client().responses.create(**self._request(prompt, model, schema, schema_name))
+        return response.output_text, self._usage(response)
+
+    def stream(self, prompt, model=None):
+        for event in self._client().responses.create(**self._request(prompt, model, None), stream=True):
+            if event.type == "response.output_text.delta":
+                yield event.delta
+
+    async def agenerate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        response = await self._async_client().responses.create(**self._request(prompt, model, schema, schema_name))
+        return response.output_text, self._usage(response)
+
+    async def astream(self, prompt, model=None):
+        events = await self._async_client().responses.create(**self._request(prompt, model, None), stream=True)
+        async for event in events:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+
+
+class OllamaBackend(LLMBackend):
+    """Local models through a (shared) Ollama client."""
+
+    name = "ollama"
+    default_model = "gemma3:1b"
+
+    def __init__(self, client=None, async_client=None):
+        self.client = client
+        self.async_client = async_client
+        # Without a client, the shared one built by llm_client is used (and filled in lazily)
+        self._injected = client is not None
+
+    def cache_identity(self):
+        return f"{self.name}:{_client_identity(self.client)}" if self._injected else self.name
+
+    def _client(self):
+        if self.client is None:
+            import llm_client
+            self.client = llm_client.get_ollama_client()
+        return self.client
+
+    def _async_client(self):
+        if self.async_client is None:
+            # Not stored: the shared async client belongs to the running event loop
+            import llm_client
+            return llm_client.get_async_ollama_client()
+        return self.async_client
+
+    @staticmethod
+    def _usage(prompt, response):
+        evaluated = getattr(response, "prompt_eval_count", None)
+        if evaluated is None:
+            return None
+        # Ollama only evaluates the part of the prompt not already in its KV cache;
+        # the full prompt length is estimated locally, so cached_tokens is approximate
+        total = max(evaluated, tokens.estimate_tokens(prompt))
+        return {"prompt_tokens": total, "completion_tokens": getattr(response, "eval_count", 0) or 0,
+                "cached_tokens": total - evaluated}
+
+    def generate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        extra = {"format": schema} if schema is not None else {}
+        response = self._client().generate(model=model or self.default_model, prompt=prompt, **extra)
+        return response.response, self._usage(prompt, response)
+
+    def stream(self, prompt, model=None):
+        for part in self._client().generate(model=model or self.default_model, prompt=prompt, stream=True):
+            yield part.response
+
+    async def agenerate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        extra = {"format": schema} if schema is not None else {}
+        response = await self._async_client().generate(model=model or self.default_model, prompt=prompt, **extra)
+        return response.response, self._usage(prompt, response)
+
+    async def astream(self, prompt, model=None):
+        parts = await self._async_client().generate(model=model or self.default_model, prompt=prompt, stream=True)
+        async for part in parts:
+            yield part.response
+
+
+class FakeBackendError(Exception):
+    """Injected failure from FakeBackend; `status` mimics an HTTP status code."""
+
+    def __init__(self, message, status=500):
+        super().__init__(message)
+        self.status = status
+
+
+def _is_template(text) -> bool:
+    """Whether text is a str.format template over `prompt`/`model` only; a canned JSON answer is not."""
+    try:
+        fields = {name for _, name, _, _ in string.Formatter().parse(text) if name is not None}
+    except ValueError:
+        return False
+    return fields <= {"prompt", "model"}
+
+
+class FakeBackend(LLMBackend):
+    """
+    Offline stand-in with simulated latency.
+
+    response: a string (formatted with `prompt` and `model` if those are its only
+    fields, otherwise returned as is, e.g. a canned JSON answer), a callable
+    `response(prompt) -> str`, or a list of strings used round-robin.
+    schema_response: value (or callable) returned for schema-constrained calls.
+    Each call waits latency +/- jitter seconds, plus len(tokens) / tokens_per_second
+    when a token rate is set; error_rate of calls raise FakeBackendError(error_status).
+    With prefix_cache_block (characters), prompts sharing a leading block sequence
+    with an earlier prompt report those tokens as cached, like provider prefix
+    caching (OpenAI only caches prompts of 1024+ tokens; see min_cached_tokens).
+    """
+
+    name = "fake"
+    default_model = "fake-model"
+
+    def __init__(self, response="Simulated response for: {prompt:.40}", schema_response=None, latency=0.0,
+                 jitter=0.0, tokens_per_second=None, error_rate=0.0, error_status=500, seed=None,
+                 prefix_cache_block=None, min_cached_tokens=0):
+        self.response = response
+        self.schema_response = schema_response
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.prefix_cache_block = prefix_cache_block
+        self.min_cached_tokens = min_cached_tokens
+        self._prefixes = set()
+        self.calls = 0
+        self.errors = 0
+        self.prompts = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Responses are per instance, so cached entries are too
+        self._cache_id = os.urandom(8).hex()
+
+    def cache_identity(self):
+        return f"{self.name}:{self._cache_id}"
+
+    def _text(self, prompt, model, schema):
+        with self._lock:
+            self.calls += 1
+            self.prompts.append(prompt)
+            index = self.calls - 1
+            failed = self._random.random() < self.error_rate
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            if failed:
+                self.errors += 1
+        if failed:
+            return delay, None
+        if schema is not None:
+            value = self.schema_response(prompt) if callable(self.schema_response) else self.schema_response
+            return delay, json.dumps(value if value is not None else {})
+        if callable(self.response):
+            return delay, self.response(prompt)
+        if isinstance(self.response, list):
+            return delay, self.response[index % len(self.response)]
+        if not _is_template(self.response):
+            return delay, self.response
+        return delay, self.response.format(prompt=prompt, model=model or self.default_model)
+
+    def _cached_tokens(self, prompt):
+        """Tokens in the longest run of leading blocks seen before; records this prompt's blocks."""
+        if not self.prefix_cache_block:
+            return 0
+        ends = range(self.prefix_cache_block, len(prompt) + 1, self.prefix_cache_block)
+        matched = 0
+        with self._lock:
+            for end in ends:
+                prefix = hash(prompt[:end])
+                if matched == end - self.prefix_cache_block and prefix in self._prefixes:
+                    matched = end
+                self._prefixes.add(prefix)
+        cached = tokens.estimate_tokens(prompt[:matched])
+        return cached if cached >= self.min_cached_tokens else 0
+
+    def clear_prefix_cache(self):
+        with self._lock:
+            self._prefixes.clear()
+
+    def _chunks(self, text):
+        words = text.split(" ")
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    def _token_delay(self, chunk):
+        return 1.0 / self.tokens_per_second if self.tokens_per_second and chunk else 0.0
+
+    def _fail(self):
+        raise FakeBackendError(f"simulated backend error {self.error_status}", self.error_status)
+
+    def _usage(self, prompt, text):
+        return {"prompt_tokens": tokens.estimate_tokens(prompt), "completion_tokens": tokens.estimate_tokens(text),
+                "cached_tokens": self._cached_tokens(prompt)}
+
+    def generate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        delay, text = self._text(prompt, model, schema)
+        if self.tokens_per_second and text:
+            delay += len(self._chunks(text)) / self.tokens_per_second
+        time.sleep(delay)
+        if text is None:
+            self._fail()
+        return text, self._usage(prompt, text)
+
+    def stream(self, prompt, model=None):
+        delay, text = self._text(prompt, model, None)
+        time.sleep(delay)
+        if text is None:
+            self._fail()
+        for chunk in self._chunks(text):
+            time.sleep(self._token_delay(chunk))
+            yield chunk
+
+    async def agenerate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        delay, text = self._text(prompt, model, schema)
+        if self.tokens_per_second and text:
+            delay += len(self._chunks(text)) / self.tokens_per_second
+        await asyncio.sleep(delay)
+        if text is None:
+            self._fail()
+        return text, self._usage(prompt, text)
+
+    async def astream(self, prompt, model=None):
+        delay, text = self._text(prompt, model, None)
+        await asyncio.sleep(delay)
+        if text is None:
+            self._fail()
+        for chunk in self._chunks(text):
+            await asyncio.sleep(self._token_delay(chunk))
+            yield chunk
@@ -0,0 +1,456 @@
+"""
+Shared LLM clients for all agents.
+
+Creating OpenAI(...) or an Ollama client per call means a new HTTP connection
+pool (and TLS handshake) for every step of a CoT run. This module keeps one
+long-lived client per backend with keep-alive connection pooling. Agents take
+an optional `client`, which may be an SDK client or any llm_backends.LLMBackend
+(e.g. FakeBackend for offline load tests). Backend calls go through
+`scheduler` (llm_scheduler) for rate limits, retries and priorities;
+`aquery`/`astream` do the same for async callers.
+"""
+
+import asyncio
+import functools
+import json
+import threading
+import weakref
+
+import llm_backends
+import llm_scheduler
+import response_cache
+import tokens
+import tracing
+
+DEFAULT_MODEL = llm_backends.OpenAIBackend.default_model
+DEFAULT_OLLAMA_MODEL = llm_backends.OllamaBackend.default_model
+
+# Connection pool settings used when the shared clients are first created
+pool_settings = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60.0,
+    "timeout": 120.0,
+}
+
+_lock = threading.Lock()
+_openai_client = None
+_ollama_client = None
+# Whether the shared clients were installed with set_*_client rather than built here
+_openai_injected = False
+_ollama_injected = False
+# Async clients hold connections bound to one event loop, so there is a shared pair per loop
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> {"openai": client, "ollama": client}
+
+# Every call here is temperature=0, so identical prompts can be answered from cache.
+# Set to None to disable caching, or to ResponseCache(db_path=...) for a disk tier.
+cache = response_cache.ResponseCache()
+
+# Rate limits, adaptive concurrency, retries and priorities for every backend call (cache misses).
+# Replace with Scheduler(requests_per_minute=..., tokens_per_minute=...) for the provider's limits,
+# or set to None to call backends directly. The shared OpenAI client leaves retries to the scheduler
+# when one is installed at the time it is built; call close() after changing this to rebuild it.
+scheduler = llm_scheduler.Scheduler()
+
+
+def configure_pool(max_connections=None, max_keepalive_connections=None, keepalive_expiry=None, timeout=None):
+    """Change pool settings. Already-created shared clients are closed and rebuilt lazily."""
+    updates = {
+        "max_connections": max_connections,
+        "max_keepalive_connections": max_keepalive_connections,
+        "keepalive_expiry": keepalive_expiry,
+        "timeout": timeout,
+    }
+    with _lock:
+        pool_settings.update({k: v for k, v in updates.items() if v is not None})
+    close()
+
+
+def _limits():
+    import httpx
+
+    return httpx.Limits(
+        max_connections=pool_settings["max_connections"],
+        max_keepalive_connections=pool_settings["max_keepalive_connections"],
+        keepalive_expiry=pool_settings["keepalive_expiry"],
+    )
+
+
+def get_openai_client():
+    """Return the shared OpenAI client, creating it on first use."""
+    global _openai_client
+    if _openai_client is None:
+        with _lock:
+            if _openai_client is None:
+                from openai import OpenAI, DefaultHttpxClient
+                import data_info
+
+                # The scheduler retries throttling and server errors itself; SDK retries on top would multiply them
+                retries = {"max_retries": 0} if scheduler is not None else {}
+                _openai_client = OpenAI(
+                    api_key=data_info.open_ai_key,
+                    http_client=DefaultHttpxClient(limits=_limits(), timeout=pool_settings["timeout"]),
+                    **retries,
+                )
+    return _openai_client
+
+
+def _async_client(name, build):
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.setdefault(loop, {})
+        if name not in clients:
+            clients[name] = build()
+        return clients[name]
+
+
+def get_async_openai_client():
+    """Return the running event loop's shared AsyncOpenAI client, pooled and retried like get_openai_client."""
+    def build():
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        import data_info
+
+        retries = {"max_retries": 0} if scheduler is not None else {}
+        return AsyncOpenAI(
+            api_key=data_info.open_ai_key,
+            http_client=DefaultAsyncHttpxClient(limits=_limits(), timeout=pool_settings["timeout"]),
+            **retries,
+        )
+
+    return _async_client("openai", build)
+
+
+def get_async_ollama_client():
+    """Return the running event loop's shared Ollama AsyncClient, with the same pool settings."""
+    def build():
+        import ollama
+
+        return ollama.AsyncClient(limits=_limits(), timeout=pool_settings["timeout"])
+
+    return _async_client("ollama", build)
+
+
+def get_ollama_client():
+    """Return the shared Ollama client, creating it on first use."""
+    global _ollama_client
+    if _ollama_client is None:
+        with _lock:
+            if _ollama_client is None:
+                import ollama
+
+                _ollama_client = ollama.Client(limits=_limits(), timeout=pool_settings["timeout"])
+    return _ollama_client
+
+
+def set_openai_client(client):
+    """Replace the shared OpenAI client (e.g. with a stand-in for tests)."""
+    global _openai_client, _openai_injected
+    with _lock:
+        _openai_client = client
+        _openai_injected = client is not None
+
+
+def set_ollama_client(client):
+    """Replace the shared Ollama client (e.g. with a stand-in for tests)."""
+    global _ollama_client, _ollama_injected
+    with _lock:
+        _ollama_client = client
+        _ollama_injected = client is not None
+
+
+def close():
+    """
+    Close the shared clients and drop them so they get rebuilt on next use. Async
+    clients are only dropped (closing them needs their event loop) and release
+    their connections when garbage collected.
+    """
+    global _openai_client, _ollama_client, _openai_injected, _ollama_injected
+    with _lock:
+        for client in (_openai_client, _ollama_client):
+            closer = getattr(client, "close", None) or getattr(getattr(client, "_client", None), "close", None)
+            if closer is not None:
+                closer()
+        _openai_client = None
+        _ollama_client = None
+        _openai_injected = _ollama_injected = False
+        _async_clients.clear()
+
+
+def _llm_attrs(backend, model):
+    parent = tracing.current_span()
+    return {"backend": backend, "model": model, "step": parent.name if parent is not None else "", "retries": 0}
+
+
+def _llm_span(backend, model, prompt):
+    return tracing.span("llm", **_llm_attrs(backend, model))
+
+
+def _cache_key(backend, model, prompt, params):
+    # The backend's identity rather than its name: a stand-in client must not share entries with the provider
+    return response_cache.make_key(backend.cache_identity(), model, prompt, params)
+
+
+def _cached(backend, model, prompt, params, call, use_cache):
+    with _llm_span(backend.name, model, prompt) as span:
+        calls = []
+
+        def counted_call():
+            calls.append(1)
+            return call()
+
+        if cache is None:
+            text = counted_call()
+        else:
+            key = _cache_key(backend, model, prompt, params)
+            text = cache.get_or_call(key, counted_call, bypass=not use_cache)
+        if span is not None:
+            span.set(cache_hit=not calls)
+            # Backend-reported usage (set by _generate) wins over the local estimate
+            span.attrs.setdefault("prompt_tokens", tokens.estimate_tokens(prompt))
+            span.attrs.setdefault("completion_tokens", tokens.estimate_tokens(text))
+        return text
+
+
+def _usage_tokens(result):
+    usage = result[1]
+    return usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0) if usage else None
+
+
+def _generate(backend, prompt, model, schema=None, schema_name="result"):
+    """backend.generate, recording the provider's token usage (including cached prompt tokens) on the llm span."""
+    if scheduler is None:
+        text, usage = backend.generate_with_usage(prompt, model, schema, schema_name)
+    else:
+        text, usage = scheduler.call(lambda: backend.generate_with_usage(prompt, model, schema, schema_name),
+                                     tokens.estimate_tokens(prompt) + scheduler.completion_tokens, _usage_tokens)
+    _record_usage(usage)
+    return text
+
+
+def _record_usage(usage):
+    span = tracing.current_span()
+    if usage is not None and span is not None and span.name == "llm":
+        span.set(**usage)
+
+
+def openai_backend(client=None):
+    """
+    The llm_backends.LLMBackend used for OpenAI calls; `client` may already be a backend.
+    Without a client the shared one is only created on the first backend call, so cache hits never need it.
+    """
+    if client is None and _openai_injected:
+        client = _openai_client
+    return client if isinstance(client, llm_backends.LLMBackend) else llm_backends.OpenAIBackend(client)
+
+
+def ollama_backend(client=None):
+    """The llm_backends.LLMBackend used for Ollama calls; `client` may already be a backend (created lazily too)."""
+    if client is None and _ollama_injected:
+        client = _ollama_client
+    return client if isinstance(client, llm_backends.LLMBackend) else llm_backends.OllamaBackend(client)
+
+
+# backend name -> (resolver, request params that are part of the cache key)
+BACKENDS = {
+    "openai": (openai_backend, {"temperature": 0}),
+    "ollama": (ollama_backend, {}),
+}
+
+
+def query(prompt: str, backend="openai", model=None, client=None, use_cache=True) -> str:
+    """Send a prompt to `backend` ("openai" or "ollama") and return the response text."""
+    resolve, params = BACKENDS[backend]
+    backend = resolve(client)
+    model = model or backend.default_model
+    return _cached(backend, model, prompt, params, lambda: _generate(backend, prompt, model), use_cache)
+
+
+def query_openai(prompt: str, model=None, client=None, use_cache=True) -> str:
+    """Send a prompt through the Responses API and return the output text."""
+    return query(prompt, "openai", model, client, use_cache)
+
+
+def query_openai_json(prompt: str, schema: dict, name="result", model=None, client=None, use_cache=True) -> dict:
+    """Schema-constrained (structured output) call; returns the parsed JSON object."""
+    backend = openai_backend(client)
+    model = model or backend.default_model
+    params = {"temperature": 0, "schema": schema}
+    parsed = []
+
+    def call():
+        text = _generate(backend, prompt, model, schema, schema_name=name)
+        # Parsed before the cache stores it, so a malformed answer raises and is never cached
+        parsed.append(json.loads(text))
+        return text
+
+    text = _cached(backend, model, prompt, params, call, use_cache)
+    if parsed:
+        return parsed[0]
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        # A malformed entry from before answers were validated: fetch again, replacing it
+        _cached(backend, model, prompt, params, call, use_cache=False)
+        return parsed[0]
+
+
+def query_ollama(prompt: str, model=None, client=None, use_cache=True) -> str:
+    """Send a prompt to a local Ollama model and return the response text."""
+    return query(prompt, "ollama", model, client, use_cache)
+
+
+def _stream_cached(backend, model, prompt, params, chunks, use_cache):
+    """Yield text chunks from chunks(), serving and filling the response cache around the stream."""
+    # The llm span is current only while the stream runs, not while the consumer holds a chunk
+    yield from tracing.span_generator("llm", _stream_chunks(backend, model, prompt, params, chunks, use_cache),
+                                      **_llm_attrs(backend.name, model))
+
+
+def _stream_chunks(backend, model, prompt, params, chunks, use_cache):
+    span = tracing.current_span() if tracing.tracer.enabled else None
+    key = _cache_key(backend, model, prompt, params) if cache is not None else None
+    if key is not None and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            if span is not None:
+                span.set(prompt_tokens=tokens.estimate_tokens(prompt),
+                         completion_tokens=tokens.estimate_tokens(cached), cache_hit=True)
+            yield cached
+            return
+    if scheduler is not None:
+        prompt_tokens = tokens.estimate_tokens(prompt)
+        chunks = functools.partial(scheduler.stream, chunks, prompt_tokens + scheduler.completion_tokens,
+                                   lambda parts: prompt_tokens + tokens.estimate_tokens("".join(parts)))
+    parts = []
+    for chunk in chunks():
+        if chunk:
+            parts.append(chunk)
+            yield chunk
+    text = "".join(parts)
+    if span is not None:
+        span.set(prompt_tokens=tokens.estimate_tokens(prompt), completion_tokens=tokens.estimate_tokens(text),
+                 cache_hit=False, streamed=True)
+    if key is not None:
+        cache.set(key, text)
+
+
+def stream(prompt: str, backend="openai", model=None, client=None, use_cache=True):
+    """Like query, but yield response text chunks as they arrive."""
+    resolve, params = BACKENDS[backend]
+    backend = resolve(client)
+    model = model or backend.default_model
+    return _stream_cached(backend, model, prompt, params, lambda: backend.stream(prompt, model), use_cache)
+
+
+def stream_openai(prompt: str, model=None, client=None, use_cache=True):
+    """Like query_openai, but yield output text deltas as they arrive."""
+    return stream(prompt, "openai", model, client, use_cache)
+
+
+def stream_ollama(prompt: str, model=None, client=None, use_cache=True):
+    """Like query_ollama, but yield response text chunks as they arrive."""
+    return stream(prompt, "ollama", model, client, use_cache)
+
+
+async def _acached(backend, model, prompt, params, call, use_cache):
+    """_cached for coroutines: call() is awaited on a cache miss."""
+    with _llm_span(backend.name, model, prompt) as span:
+        key = _cache_key(backend, model, prompt, params) if cache is not None else None
+        text = cache.get(key) if key is not None and use_cache else None
+        hit = text is not None
+        if not hit:
+            text = await call()
+            if key is not None:
+                cache.set(key, text)
+        if span is not None:
+            span.set(cache_hit=hit)
+            span.attrs.setdefault("prompt_tokens", tokens.estimate_tokens(prompt))
+            span.attrs.setdefault("completion_tokens", tokens.estimate_tokens(text))
+        return text
+
+
+async def _agenerate(backend, prompt, model, schema=None, schema_name="result"):
+    """_generate for coroutines, through scheduler.acall."""
+    def call():
+        return backend.agenerate_with_usage(prompt, model, schema, schema_name)
+
+    if scheduler is None:
+        text, usage = await call()
+    else:
+        text, usage = await scheduler.acall(call, tokens.estimate_tokens(prompt) + scheduler.completion_tokens,
+                                            _usage_tokens)
+    _record_usage(usage)
+    return text
+
+
+async def aquery(prompt: str, backend="openai", model=None, client=None, use_cache=True) -> str:
+    """query for async callers: the same cache, llm span and scheduler, awaiting the backend's async client."""
+    resolve, params = BACKENDS[backend]
+    backend = resolve(client)
+    model = model or backend.default_model
+    return await _acached(backend, model, prompt, params, lambda: _agenerate(backend, prompt, model), use_cache)
+
+
+async def _astream_chunks(backend, model, prompt, params, chunks, use_cache):
+    span = tracing.current_span() if tracing.tracer.enabled else None
+    key = _cache_key(backend, model, prompt, params) if cache is not None else None
+    if key is not None and use_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            if span is not None:
+                span.set(prompt_tokens=tokens.estimate_tokens(prompt),
+                         completion_tokens=tokens.estimate_tokens(cached), cache_hit=True)
+            yield cached
+            return
+    if scheduler is not None:
+        prompt_tokens = tokens.estimate_tokens(prompt)
+        chunks = functools.partial(scheduler.astream, chunks, prompt_tokens + scheduler.completion_tokens,
+                                   lambda parts: prompt_tokens + tokens.estimate_tokens("".join(parts)))
+    parts = []
+    stream = chunks()
+    try:
+        async for chunk in stream:
+            if chunk:
+                parts.append(chunk)
+                yield chunk
+    finally:
+        # Unlike a generator, an abandoned async generator is only closed later by the event loop
+        await stream.aclose()
+    text = "".join(parts)
+    if span is not None:
+        span.set(prompt_tokens=tokens.estimate_tokens(prompt), completion_tokens=tokens.estimate_tokens(text),
+                 cache_hit=False, streamed=True)
+    if key is not None:
+        cache.set(key, text)
+
+
+def astream(prompt: str, backend="openai", model=None, client=None, use_cache=True):
+    """Like stream, but an async generator for async callers."""
+    resolve, params = BACKENDS[backend]
+    backend = resolve(client)
+    model = model or backend.default_model
+    chunks = _astream_chunks(backend, model, prompt, params, lambda: backend.astream(prompt, model), use_cache)
+    return tracing.aspan_generator("llm", chunks, **_llm_attrs(backend.name, model))
+
+
+def relay(stream):
+    """Re-yield a text stream and return the joined text: `text = yield from relay(stream)`."""
+    parts = []
+    for chunk in stream:
+        parts.append(chunk)
+        yield chunk
+    return "".join(parts)
+
+
+def collect(stream, on_chunk=None):
+    """
+    Drain an agent's streaming generator, passing each chunk to on_chunk, and
+    return the generator's final result (the same value the non-streaming call returns).
+    """
+    while True:
+        try:
+            chunk = next(stream)
+        except StopIteration as done:
+            return done.value
+        if on_chunk is not None:
+            on_chunk(chunk)
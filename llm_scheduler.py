@@ -0,0 +1,367 @@
+"""
+Rate-limit-aware scheduling for LLM backend calls.
+
+Fanning out many agents at once runs into provider rate limits, and without
+retries one 429 fails a whole CoT chain after its earlier steps were paid
+for. llm_client sends every backend call (cache misses only) through
+`llm_client.scheduler`, which:
+
+- admits a call only when token buckets for requests/min and tokens/min have
+  room (a call costs its estimated prompt tokens plus `completion_tokens`;
+  the bucket is corrected with the provider-reported usage afterwards);
+- caps calls in flight with an AIMD limit: +1/limit per success, halved on a
+  throttling or server error (at most once per window of in-flight calls);
+- retries 429/5xx and connection errors with full-jitter exponential backoff,
+  honouring Retry-After, and records the count on the llm span's `retries`;
+- orders waiting calls by priority class, so interactive fraud checks go
+  ahead of batch jobs:
+
+    llm_client.scheduler = llm_scheduler.Scheduler(requests_per_minute=500, tokens_per_minute=200_000)
+    with llm_scheduler.priority("batch"):
+        transaction_stream.score_stream(agent, lines, out)
+
+Coroutines use `acall`/`astream`, which share the queue and limits with
+sync calls. The priority lives in a contextvar, so tracing.bind carries it
+into pool threads and asyncio tasks inherit it. Against FakeBackend(error_rate=0.3, error_status=429) the limit
+backs off and calls succeed after retries.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import tracing
+
+PRIORITIES = {"interactive": 0, "normal": 1, "batch": 2}
+# Statuses worth retrying; all of them also shrink the concurrency limit
+RETRY_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+_priority = contextvars.ContextVar("llm_scheduler_priority", default="interactive")
+
+
+@contextlib.contextmanager
+def priority(name):
+    """Run the calls made inside the block (and in threads started via tracing.bind) at priority `name`."""
+    if name not in PRIORITIES:
+        raise ValueError(f"unknown priority {name!r}; expected one of {sorted(PRIORITIES)}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    return _priority.get()
+
+
+def error_status(error):
+    """HTTP status of an SDK error (OpenAI/Ollama `status_code`, FakeBackendError `status`), or None."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error) -> bool:
+    status = error_status(error)
+    if status is not None:
+        return status in RETRY_STATUSES or status >= 500
+    # Connection resets and timeouts; the SDKs' own connection errors carry the same names
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in (
+        "APIConnectionError", "APITimeoutError", "ConnectError", "ReadTimeout", "ConnectTimeout")
+
+
+def retry_after(error):
+    """Seconds from a Retry-After response header, or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    try:
+        return float(headers.get("retry-after")) if headers is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """`per_minute` units refilled continuously, holding at most `burst` (default: one minute's worth)."""
+
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or per_minute)
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self, amount, now) -> float:
+        """Seconds until `amount` can be taken (amounts above capacity wait for a full bucket)."""
+        self._refill(now)
+        shortfall = min(amount, self.capacity) - self.level
+        return shortfall / self.rate if shortfall > 0 else 0.0
+
+    def take(self, amount):
+        self.level -= amount
+
+    def adjust(self, amount):
+        """Charge `amount` more (or refund, if negative) after the real cost is known."""
+        self.level = min(self.capacity, self.level - amount)
+
+
+class Scheduler:
+    """
+    Admission control, adaptive concurrency and retries for backend calls; safe to share between threads.
+    Rate limits of None are unlimited.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_concurrency=16, min_concurrency=1,
+                 max_retries=4, backoff_base=0.5, backoff_max=30.0, completion_tokens=256, seed=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # Estimated output tokens charged to the tokens/min bucket until usage is known
+        self.completion_tokens = completion_tokens
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failed": 0, "queued_s": 0.0, "backoff_s": 0.0}
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._waiting = []  # heap of (priority rank, arrival) tickets
+        self._arrivals = itertools.count()
+        self._random = random.Random(seed)
+        self._cond = threading.Condition()
+
+    def _delay(self, cost, now):
+        delay = self.requests.delay(1, now) if self.requests is not None else 0.0
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(cost, now))
+        return delay
+
+    def _admit(self, cost, rank) -> float:
+        """Block until this call is first in line, under the concurrency limit and within the rate limits."""
+        ticket = (rank, next(self._arrivals))
+        start = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    if self._waiting[0] == ticket and self._in_flight < int(self.limit):
+                        delay = self._delay(cost, time.monotonic())
+                        if delay <= 0:
+                            break
+                        self._cond.wait(delay)
+                    else:
+                        self._cond.wait()
+            except BaseException:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._in_flight += 1
+            if self.requests is not None:
+                self.requests.take(1)
+            if self.tokens is not None:
+                self.tokens.take(cost)
+            now = time.monotonic()
+            self.stats["queued_s"] += now - start
+            # The next in line may also fit
+            self._cond.notify_all()
+        return now
+
+    def _release(self, admitted, outcome, used=None, cost=0):
+        """outcome: "ok" grows the limit, "throttled" shrinks it, "failed" leaves it alone."""
+        with self._cond:
+            self._in_flight -= 1
+            if outcome == "ok":
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+                if used is not None and self.tokens is not None:
+                    self.tokens.adjust(used - cost)
+            elif outcome == "throttled":
+                self.stats["throttled"] += 1
+                # Calls admitted before the last decrease saw the old limit; one cut per window is enough
+                if admitted >= self._last_decrease:
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+                    self._last_decrease = time.monotonic()
+            self._cond.notify_all()
+
+    def _backoff(self, attempt, error) -> float:
+        delay = self._random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+        return max(delay, retry_after(error) or 0.0)
+
+    async def _aadmit(self, cost, rank) -> float:
+        """_admit for coroutines: waits in a worker thread, so async and sync calls share one queue."""
+        admission = asyncio.ensure_future(asyncio.to_thread(self._admit, cost, rank))
+        try:
+            return await asyncio.shield(admission)
+        except asyncio.CancelledError:
+            # The thread still takes the slot once admitted; hand it straight back
+            admission.add_done_callback(
+                lambda done: done.cancelled() or done.exception() or self._release(done.result(), "failed"))
+            raise
+
+    def _failed(self, admitted, error, attempt):
+        """
+        Release a failed attempt, then re-raise `error` if it is final, or record the
+        retry on the current llm span and return (next attempt number, backoff seconds).
+        """
+        retryable = is_retryable(error)
+        self._release(admitted, "throttled" if retryable else "failed")
+        if not retryable or attempt >= self.max_retries:
+            with self._cond:
+                self.stats["failed"] += 1
+            raise error
+        attempt += 1
+        delay = self._backoff(attempt, error)
+        with self._cond:
+            self.stats["retries"] += 1
+            self.stats["backoff_s"] += delay
+        span = tracing.current_span()
+        if span is not None and span.name == "llm":
+            span.set(retries=attempt)
+        return attempt, delay
+
+    def _rank(self, priority_name):
+        return PRIORITIES[priority_name or _priority.get()]
+
+    def call(self, fn, cost=0, used=None, priority=None):
+        """
+        fn() under the limits, retrying throttling and server errors. `cost` is the
+        estimated tokens; used(result) may return the real count (or None).
+        """
+        rank = self._rank(priority)
+        attempt = 0
+        while True:
+            admitted = self._admit(cost, rank)
+            try:
+                result = fn()
+            except Exception as e:
+                attempt, delay = self._failed(admitted, e, attempt)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                # KeyboardInterrupt and the like: give the slot back, no retry
+                self._release(admitted, "failed")
+                raise
+            self._release(admitted, "ok", used(result) if used is not None else None, cost)
+            with self._cond:
+                self.stats["calls"] += 1
+            return result
+
+    async def acall(self, fn, cost=0, used=None, priority=None):
+        """call for coroutines: awaits fn() under the same limits, queue and retries as sync calls."""
+        rank = self._rank(priority)
+        attempt = 0
+        while True:
+            admitted = await self._aadmit(cost, rank)
+            try:
+                result = await fn()
+            except Exception as e:
+                attempt, delay = self._failed(admitted, e, attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                # Including cancellation of the awaiting task
+                self._release(admitted, "failed")
+                raise
+            self._release(admitted, "ok", used(result) if used is not None else None, cost)
+            with self._cond:
+                self.stats["calls"] += 1
+            return result
+
+    def stream(self, chunks, cost=0, used=None, priority=None):
+        """
+        Yield from chunks() under the limits, holding a slot until the stream ends. Errors
+        before the first chunk are retried; later ones are raised (the text is partly sent).
+        used(parts) may return the real token count once the stream is done.
+        """
+        rank = self._rank(priority)
+        attempt = 0
+        while True:
+            admitted = self._admit(cost, rank)
+            try:
+                iterator = iter(chunks())
+                first = next(iterator, None)
+            except Exception as e:
+                attempt, delay = self._failed(admitted, e, attempt)
+                time.sleep(delay)
+                continue
+            except BaseException:
+                self._release(admitted, "failed")
+                raise
+            break
+
+        parts = []
+        outcome = "failed"
+        try:
+            if first is not None:
+                parts.append(first)
+                yield first
+                for chunk in iterator:
+                    parts.append(chunk)
+                    yield chunk
+            outcome = "ok"
+        except GeneratorExit:
+            # The consumer stopped early; the backend itself did not fail
+            outcome = "ok"
+            raise
+        finally:
+            self._release(admitted, outcome, used(parts) if used is not None and outcome == "ok" else None, cost)
+            with self._cond:
+                self.stats["calls" if outcome == "ok" else "failed"] += 1
+
+    async def astream(self, chunks, cost=0, used=None, priority=None):
+        """stream for async iterators: chunks() returns one, and the slot is held until it ends."""
+        rank = self._rank(priority)
+        attempt = 0
+        while True:
+            admitted = await self._aadmit(cost, rank)
+            try:
+                iterator = chunks().__aiter__()
+                first = await iterator.__anext__()
+            except StopAsyncIteration:
+                first = None
+            except Exception as e:
+                attempt, delay = self._failed(admitted, e, attempt)
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                self._release(admitted, "failed")
+                raise
+            break
+
+        parts = []
+        outcome = "failed"
+        try:
+            if first is not None:
+                parts.append(first)
+                yield first
+                async for chunk in iterator:
+                    parts.append(chunk)
+                    yield chunk
+            outcome = "ok"
+        except GeneratorExit:
+            outcome = "ok"
+            raise
+        finally:
+            try:
+                aclose = getattr(iterator, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+            finally:
+                self._release(admitted, outcome, used(parts) if used is not None and outcome == "ok" else None, cost)
+                with self._cond:
+                    self.stats["calls" if outcome == "ok" else "failed"] += 1
+
+    def snapshot(self) -> dict:
+        """Current limit, in-flight and waiting counts plus the running stats."""
+        with self._cond:
+            return {"limit": self.limit, "in_flight": self._in_flight, "waiting": len(self._waiting), **self.stats}
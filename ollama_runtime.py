@@ -0,0 +1,170 @@
+"""
+Ollama model lifecycle: warm-up, keep_alive pinning and bounded concurrency.
+
+A cold `generate` call first has to load the model, which dominates the
+latency of the first request after the server has been idle. OllamaRuntime
+loads the model up front (`warm_up`), passes `keep_alive` on every request so
+the server keeps it resident, and caps in-flight requests at `parallelism`
+for both the sync client (thread pools) and the async client. A stream holds
+its slot until it ends, since the server is generating for it all along.
+`agenerate_many` (or `generate_many` from sync code) runs a batch of prompts
+concurrently on ollama.AsyncClient through llm_client.aquery, so the
+response cache, llm spans and scheduler apply. The server only runs that
+many requests at once if it is started with OLLAMA_NUM_PARALLEL >=
+parallelism.
+
+Ollama reports load, prompt evaluation and generation durations per request;
+they are accumulated in `stats` and recorded on the llm tracing span, so
+model load time can be told apart from generation time.
+
+    runtime = OllamaRuntime("gemma3:1b", keep_alive="30m", parallelism=4)
+    runtime.warm_up()
+    agent = FraudDetectionAgent(client=runtime)
+"""
+
+import asyncio
+import threading
+import weakref
+
+import llm_backends
+import llm_client
+
+NANOSECONDS = 1e9
+
+
+class OllamaRuntime(llm_backends.OllamaBackend):
+    """OllamaBackend that keeps its model loaded and bounds concurrent requests."""
+
+    def __init__(self, model=llm_backends.OllamaBackend.default_model, keep_alive="30m", parallelism=4,
+                 client=None, host=None, cold_start_threshold=0.5, async_client=None):
+        super().__init__(client, async_client)
+        self.default_model = model
+        self.keep_alive = keep_alive
+        self.parallelism = parallelism
+        self.host = host
+        # A request whose load_duration exceeds this many seconds counts as a cold start
+        self.cold_start_threshold = cold_start_threshold
+        self.stats = {"requests": 0, "cold_starts": 0, "load_s": 0.0, "prompt_eval_s": 0.0, "generation_s": 0.0}
+        self._slots = threading.BoundedSemaphore(parallelism)
+        self._lock = threading.Lock()
+        # Async clients and semaphores belong to one event loop each
+        self._per_loop = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        if self.client is None:
+            if self.host is None:
+                return super()._client()
+            import ollama
+            self.client = ollama.Client(host=self.host)
+        return self.client
+
+    def cache_identity(self):
+        if self.host is not None and not self._injected:
+            return f"{self.name}@{self.host}"
+        return super().cache_identity()
+
+    def _loop_state(self):
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None:
+            if self.async_client is not None:
+                client = self.async_client
+            elif self.host is None:
+                client = llm_client.get_async_ollama_client()
+            else:
+                import ollama
+                client = ollama.AsyncClient(host=self.host)
+            state = self._per_loop[loop] = (client, asyncio.Semaphore(self.parallelism))
+        return state
+
+    def _record(self, response) -> dict:
+        """Accumulate Ollama's per-request durations; returns them in seconds."""
+        timings = {
+            "load_s": (getattr(response, "load_duration", 0) or 0) / NANOSECONDS,
+            "prompt_eval_s": (getattr(response, "prompt_eval_duration", 0) or 0) / NANOSECONDS,
+            "generation_s": (getattr(response, "eval_duration", 0) or 0) / NANOSECONDS,
+        }
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["cold_starts"] += timings["load_s"] > self.cold_start_threshold
+            for key, value in timings.items():
+                self.stats[key] += value
+        return timings
+
+    def warm_up(self, model=None) -> float:
+        """Load the model (an empty prompt only loads it) and pin it for keep_alive; returns load seconds."""
+        response = self._client().generate(model=model or self.default_model, prompt="", keep_alive=self.keep_alive)
+        load_s = (getattr(response, "load_duration", 0) or 0) / NANOSECONDS
+        with self._lock:
+            self.stats["warmup_load_s"] = load_s
+        return load_s
+
+    def unload(self, model=None):
+        """Ask the server to drop the model from memory now."""
+        self._client().generate(model=model or self.default_model, prompt="", keep_alive=0)
+
+    def is_loaded(self, model=None) -> bool:
+        model = model or self.default_model
+        return any(getattr(m, "model", None) == model or getattr(m, "name", None) == model
+                   for m in self._client().ps().models)
+
+    def generate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        extra = {"format": schema} if schema is not None else {}
+        with self._slots:
+            response = self._client().generate(model=model or self.default_model, prompt=prompt,
+                                               keep_alive=self.keep_alive, **extra)
+        usage = self._usage(prompt, response) or {}
+        # Timings ride along with usage so llm_client records them on the llm span
+        return response.response, {**usage, **self._record(response)}
+
+    def stream(self, prompt, model=None):
+        with self._slots:
+            for part in self._client().generate(model=model or self.default_model, prompt=prompt, stream=True,
+                                                keep_alive=self.keep_alive):
+                if getattr(part, "done", False):
+                    self._record(part)
+                yield part.response
+
+    async def agenerate_with_usage(self, prompt, model=None, schema=None, schema_name="result"):
+        client, slots = self._loop_state()
+        extra = {"format": schema} if schema is not None else {}
+        async with slots:
+            response = await client.generate(model=model or self.default_model, prompt=prompt,
+                                             keep_alive=self.keep_alive, **extra)
+        usage = self._usage(prompt, response) or {}
+        return response.response, {**usage, **self._record(response)}
+
+    async def astream(self, prompt, model=None):
+        client, slots = self._loop_state()
+        async with slots:
+            parts = await client.generate(model=model or self.default_model, prompt=prompt, stream=True,
+                                          keep_alive=self.keep_alive)
+            try:
+                async for part in parts:
+                    if getattr(part, "done", False):
+                        self._record(part)
+                    yield part.response
+            finally:
+                aclose = getattr(parts, "aclose", None)
+                if aclose is not None:
+                    await aclose()
+
+    def generate_many(self, prompts, model=None) -> list:
+        """
+        Responses for prompts run concurrently (at most `parallelism` at a time), in order;
+        agenerate_many on a new event loop. Inside a running event loop, await agenerate_many instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            raise RuntimeError("generate_many would block the running event loop; await agenerate_many instead")
+        return asyncio.run(self.agenerate_many(prompts, model))
+
+    async def agenerate_many(self, prompts, model=None) -> list:
+        """
+        generate_many for async callers. Each prompt goes through llm_client.aquery, so the
+        response cache, llm spans and the scheduler apply, and runs on ollama.AsyncClient.
+        """
+        return list(await asyncio.gather(*(llm_client.aquery(prompt, self.name, model, self) for prompt in prompts)))
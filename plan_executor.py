@@ -0,0 +1,66 @@
+"""
+Dependency-aware parallel execution of CoT plan steps.
+
+Most plan steps only need the client profile, the goals and their own text,
+so they can run at the same time. A step that mentions "step 2" (or is given
+an explicit dependency) waits for that step and receives its result.
+Results always come back in plan order.
+"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import tracing
+
+STEP_REFERENCE = re.compile(r"\bsteps?\s+(\d+(?:\s*(?:,|and|&|-|to)\s*\d+)*)", re.IGNORECASE)
+
+
+def find_step_dependencies(steps: list) -> dict:
+    """Map each step index to the earlier step indexes its text refers to ("step 2", "steps 1-3")."""
+    dependencies = {}
+    for i, step in enumerate(steps):
+        # Ignore the step's own leading number ("3. Using step 1 ...")
+        text = re.sub(r"^\s*(?:step\s*)?\d+[.):]?\s*", "", step, flags=re.IGNORECASE)
+        refs = set()
+        for match in STEP_REFERENCE.finditer(text):
+            for part in re.split(r"\s*(?:,|and|&)\s*", match.group(1)):
+                bounds = re.split(r"\s*(?:-|to)\s*", part)
+                if len(bounds) == 2:
+                    refs.update(range(int(bounds[0]), int(bounds[1]) + 1))
+                else:
+                    refs.add(int(bounds[0]))
+        # Only earlier steps count, so auto-detected dependencies can never form a cycle
+        dependencies[i] = {n - 1 for n in refs if 0 < n <= i}
+    return dependencies
+
+
+def run_steps(steps: list, run_step, max_workers=4, dependencies=None) -> list:
+    """
+    Run `run_step(index, step, prior_results)` for every step using a bounded thread pool.
+
+    `dependencies` maps a step index to the indexes it must wait for; `prior_results`
+    is a dict of those indexes to their results. Returns results in plan order.
+    """
+    if dependencies is None:
+        dependencies = {}
+    for i, deps in dependencies.items():
+        if not 0 <= i < len(steps) or any(not 0 <= d < len(steps) or d == i for d in deps):
+            raise ValueError(f"Invalid dependency for step {i}: {sorted(deps)}")
+
+    results = {}
+    pending = set(range(len(steps)))
+    running = {}
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        while pending or running:
+            ready = [i for i in sorted(pending) if set(dependencies.get(i, ())) <= results.keys()]
+            for i in ready:
+                pending.discard(i)
+                prior = {d: results[d] for d in sorted(dependencies.get(i, ()))}
+                # bind keeps the caller's trace, so spans opened by run_step nest under it
+                running[pool.submit(tracing.bind(run_step), i, steps[i], prior)] = i
+            if not running:
+                raise ValueError(f"Circular step dependencies among steps {sorted(pending)}")
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+    return [results[i] for i in range(len(steps))]
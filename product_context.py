@@ -0,0 +1,98 @@
+"""
+Precomputed product context blocks for recommendation prompts.
+
+Each product's prompt text is formatted once and cached under its id together
+with the field values it was built from. `sync` (full catalog) and `upsert`
+(single product) rebuild only the blocks whose content changed; `render`
+assembles a prompt context for a list of products or ids by joining cached
+blocks, building only the ones it has never seen.
+"""
+
+import threading
+from collections.abc import Mapping
+
+CONTEXT_FIELDS = ("name", "price", "category", "brand", "description")
+
+
+def format_product_block(product) -> str:
+    """Everything after "Product N: " for one product, as used in the prompts."""
+    return (
+        f"{product['name']} - ${product['price']}\n"
+        f"Category: {product['category']}, Brand: {product['brand']}\n"
+        f"Description: {product['description'][:100]}...\n\n"
+    )
+
+
+def content_key(product) -> tuple:
+    """The values a block is built from; the cached block is current while they compare equal."""
+    return tuple(product.get(field) for field in CONTEXT_FIELDS)
+
+
+def render_blocks(blocks) -> str:
+    return "".join(f"Product {i}: {block}" for i, block in enumerate(blocks, 1))
+
+
+class ProductContextCache:
+    """Formatted context block per product id, rebuilt only when the product's content changes."""
+
+    def __init__(self):
+        self._blocks = {}  # product id -> (content key, block)
+        self._lock = threading.Lock()
+        self.stats = {"built": 0, "unchanged": 0}
+
+    def _upsert(self, product):
+        """(rebuilt, block) for the product, rebuilding the cached block if its content changed."""
+        key = content_key(product)
+        with self._lock:
+            cached = self._blocks.get(product["id"])
+            if cached is not None and cached[0] == key:
+                self.stats["unchanged"] += 1
+                return False, cached[1]
+            block = format_product_block(product)
+            self._blocks[product["id"]] = (key, block)
+            self.stats["built"] += 1
+            return True, block
+
+    def upsert(self, product) -> bool:
+        """Cache the product's block; returns True if it had to be (re)built."""
+        return self._upsert(product)[0]
+
+    def remove(self, product_id):
+        with self._lock:
+            self._blocks.pop(product_id, None)
+
+    def sync(self, products) -> int:
+        """Bring the cache in line with a full catalog (any iterable); returns how many blocks were rebuilt."""
+        # Read twice below, so a generator must not be exhausted by the first pass
+        products = list(products)
+        rebuilt = sum(self.upsert(product) for product in products)
+        current = {product["id"] for product in products}
+        with self._lock:
+            for product_id in list(self._blocks):
+                if product_id not in current:
+                    del self._blocks[product_id]
+        return rebuilt
+
+    def block(self, product_id) -> str:
+        return self._blocks[product_id][1]
+
+    def render(self, products, limit=20) -> str:
+        """
+        Context for the first `limit` products (dicts/records or ids), from the cached
+        block of each id. Only products not cached yet are built here; freshness is
+        checked by `sync`/`upsert`, so call those when the catalog changes.
+        """
+        blocks = []
+        for product in products[:limit]:
+            if not isinstance(product, Mapping):
+                blocks.append(self.block(product))
+                continue
+            cached = self._blocks.get(product["id"])
+            blocks.append(cached[1] if cached is not None else self._upsert(product)[1])
+        return render_blocks(blocks)
+
+    def __contains__(self, product_id):
+        return product_id in self._blocks
+
+    def __len__(self):
+        return len(self._blocks)
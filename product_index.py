@@ -0,0 +1,167 @@
+"""
+Local retrieval index over the product catalog.
+
+Each product's name, category, brand and description are turned into a
+signed hashed term-frequency vector (L2-normalized float32, one row per
+product), so cosine similarity is a matrix-vector product. Queries are built
+from a user's purchases, browsing and favorite categories, weighted by
+inverse document frequency. Products can be added and removed incrementally,
+and the index saves to / loads from disk with the vector matrix memory-mapped.
+"""
+
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+import records
+
+TOKEN = re.compile(r"[a-z0-9]+")
+
+# How much each product field counts towards its vector
+FIELD_WEIGHTS = {"name": 3.0, "category": 2.0, "brand": 1.0, "description": 1.0}
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+class ProductIndex:
+    """Hashed TF vectors for a product catalog with cosine top-k lookup."""
+
+    def __init__(self, dim=1024, capacity=1024):
+        self.dim = dim
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.doc_freq = np.zeros(dim, dtype=np.int64)
+        self.products = {}  # product id -> product dict
+        self.rows = {}  # product id -> row in self.vectors
+        self.row_ids = [None] * capacity  # row -> product id (None for free rows)
+        self.free_rows = list(range(capacity - 1, -1, -1))
+
+    def _bucket(self, token):
+        h = zlib.crc32(token.encode("utf-8"))
+        return h % self.dim, 1.0 if h & 0x80000000 else -1.0
+
+    def _term_vector(self, weighted_texts):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for text, weight in weighted_texts:
+            for token, count in Counter(tokenize(text)).items():
+                bucket, sign = self._bucket(token)
+                vector[bucket] += sign * weight * (1.0 + math.log(count))
+        return vector
+
+    def _product_vector(self, product):
+        vector = self._term_vector((product.get(field, ""), weight) for field, weight in FIELD_WEIGHTS.items())
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _grow(self):
+        old = len(self.vectors)
+        new = max(1, old * 2)
+        vectors = np.zeros((new, self.dim), dtype=np.float32)
+        vectors[:old] = self.vectors
+        self.vectors = vectors
+        self.active = np.concatenate([self.active, np.zeros(new - old, dtype=bool)])
+        self.row_ids.extend([None] * (new - old))
+        self.free_rows.extend(range(new - 1, old - 1, -1))
+
+    def add(self, product):
+        """Add or replace a product (dict with id, name, category, brand, description)."""
+        product_id = product["id"]
+        if product_id in self.rows:
+            self.remove(product_id)
+        if not self.free_rows:
+            self._grow()
+        row = self.free_rows.pop()
+        vector = self._product_vector(product)
+        self.vectors[row] = vector
+        self.active[row] = True
+        self.doc_freq += vector != 0
+        self.rows[product_id] = row
+        self.row_ids[row] = product_id
+        self.products[product_id] = product
+
+    def add_many(self, products):
+        for product in products:
+            self.add(product)
+
+    def remove(self, product_id):
+        row = self.rows.pop(product_id, None)
+        if row is None:
+            return
+        self.doc_freq -= self.vectors[row] != 0
+        self.vectors[row] = 0
+        self.active[row] = False
+        self.row_ids[row] = None
+        self.free_rows.append(row)
+        del self.products[product_id]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def query_vector(self, weighted_texts):
+        """IDF-weighted, normalized query vector from (text, weight) pairs."""
+        vector = self._term_vector(weighted_texts)
+        idf = np.log((1.0 + len(self.rows)) / (1.0 + self.doc_freq)).astype(np.float32) + 1.0
+        vector *= idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def top_k(self, query, k=20, exclude=()) -> list:
+        """[(product_id, score)] for the k rows most similar to the query vector."""
+        if not self.rows:
+            return []
+        scores = self.vectors @ query
+        scores[~self.active] = -np.inf
+        for product_id in exclude:
+            if product_id in self.rows:
+                scores[self.rows[product_id]] = -np.inf
+        k = min(k, len(self.rows))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.row_ids[row], float(scores[row])) for row in best if np.isfinite(scores[row])]
+
+    def candidates_for_user(self, user_profile, purchase_history, browsing_behavior, k=20) -> list:
+        """Product dicts most relevant to the user's purchases, browsing and favorite categories."""
+        weighted_texts = []
+        for purchase in purchase_history or []:
+            weighted_texts.append((purchase.get("product", ""), 1.0))
+            weighted_texts.append((purchase.get("category", ""), 0.5))
+        # Browsing is listed newest first; recent views count more
+        for age, session in enumerate(browsing_behavior or []):
+            for viewed in session.get("viewed_products", []):
+                weighted_texts.append((viewed, 2.0 / (1 + age)))
+        for category in ((user_profile or {}).get("preferences") or {}).get("favorite_categories") or []:
+            weighted_texts.append((category, 1.5))
+
+        query = self.query_vector(weighted_texts)
+        return [self.products[product_id] for product_id, _ in self.top_k(query, k)]
+
+    def save(self, directory):
+        """Write vectors.npy (memory-mappable) plus catalog metadata to `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "vectors.npy"), self.vectors)
+        np.save(os.path.join(directory, "doc_freq.npy"), self.doc_freq)
+        with open(os.path.join(directory, "catalog.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "row_ids": self.row_ids, "products": self.products}, f, default=records.json_default)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load a saved index; with mmap the vector matrix is mapped copy-on-write, not read into memory."""
+        with open(os.path.join(directory, "catalog.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls.__new__(cls)
+        index.dim = meta["dim"]
+        index.vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="c" if mmap else None)
+        index.doc_freq = np.load(os.path.join(directory, "doc_freq.npy"))
+        index.products = meta["products"]
+        index.row_ids = meta["row_ids"]
+        index.active = np.array([product_id is not None for product_id in index.row_ids], dtype=bool)
+        index.rows = {product_id: row for row, product_id in enumerate(index.row_ids) if product_id is not None}
+        index.free_rows = [row for row in range(len(index.row_ids) - 1, -1, -1) if index.row_ids[row] is None]
+        return index
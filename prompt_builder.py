@@ -0,0 +1,168 @@
+"""
+Compact, token-budgeted prompt assembly.
+
+Templates use str.format fields. Plain values are serialized as compact JSON
+(no indentation or spaces after separators). `History` values are lists that
+may be trimmed: items are ranked most relevant first (ties and the default:
+most recent first, i.e. list order), as many as fit the budget are kept in
+their original order, and the rest are replaced by a one-line summary. `Text`
+values are long strings (earlier reasoning, analyses) that are cut to fit.
+
+    prompt = prompt_builder.build(TEMPLATE, budget=4000, profile=user_profile,
+                                  purchases=prompt_builder.History(purchase_history))
+    prompt.text, prompt.tokens, prompt.report
+
+The report says, per trimmable section, how many items (or characters) were
+kept out of how many; it is also attached to the current tracing span when
+anything was trimmed. Plain values are never trimmed: if they alone exceed the
+budget, the overflow in tokens is set as `prompt_over_budget` on the span.
+"""
+
+import json
+from collections import Counter
+from collections.abc import Mapping
+
+import records
+import tokens
+import tracing
+
+DEFAULT_BUDGET = 6000
+
+# Fields summarized for items dropped from a history
+TIME_FIELDS = ("timestamp", "date")
+AMOUNT_FIELDS = ("amount", "price")
+CATEGORY_FIELDS = ("merchant_category", "category", "location", "merchant", "product")
+
+
+def compact(value) -> str:
+    """Compact JSON for prompts (strings are passed through unchanged; records become their dicts)."""
+    if isinstance(value, str):
+        return value
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=records.json_default)
+
+
+def _text(value) -> str:
+    # Pre-parsed timestamps (records) summarize like the ISO strings in dicts
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def summarize_items(items) -> dict:
+    """Counts, time range, amount totals and most common categories of a list of history dicts (or records)."""
+    summary = {"omitted": len(items)}
+    for field in TIME_FIELDS:
+        values = sorted(_text(item[field]) for item in items if isinstance(item, Mapping) and field in item)
+        if values:
+            summary[f"{field}_range"] = [values[0], values[-1]]
+    for field in AMOUNT_FIELDS:
+        values = [item[field] for item in items if isinstance(item, Mapping) and isinstance(item.get(field), (int, float))]
+        if values:
+            summary[f"{field}_total"] = round(sum(values), 2)
+            summary[f"{field}_max"] = max(values)
+    for field in CATEGORY_FIELDS:
+        values = Counter(str(item[field]) for item in items if isinstance(item, Mapping) and field in item)
+        if values:
+            summary[f"top_{field}"] = dict(values.most_common(3))
+    return summary
+
+
+class History:
+    """A list section that can be trimmed: keeps the highest-ranked items that fit, summarizes the rest."""
+
+    def __init__(self, items, relevance=None, summarize=summarize_items, min_items=0):
+        # Records would go through to_dict on every json.dumps while fitting; convert them once
+        self.items = [item.to_dict() if isinstance(item, records.Record) else item for item in items or ()]
+        self.relevance = relevance
+        self.summarize = summarize
+        self.min_items = min_items
+
+    def render(self, kept, dropped) -> str:
+        if dropped:
+            return compact(kept + [self.summarize(dropped)])
+        return compact(kept)
+
+    def fit(self, allowance):
+        """(text, tokens, report) for the best subset within `allowance` tokens."""
+        order = list(range(len(self.items)))
+        if self.relevance is not None:
+            order.sort(key=lambda i: -self.relevance(self.items[i]))
+
+        text = self.render(self.items, [])
+        used = tokens.estimate_tokens(text)
+        kept = self.items
+        if used > allowance:
+            # Greedily keep items by rank, leaving room for the summary of whatever is dropped
+            reserve = tokens.estimate_tokens(compact(self.summarize(self.items))) + 2
+            chosen, used = [], 0
+            for i in order:
+                cost = tokens.estimate_tokens(compact(self.items[i])) + 1
+                if used + cost + reserve > allowance and len(chosen) >= self.min_items:
+                    break
+                chosen.append(i)
+                used += cost
+            keep = set(chosen)
+            kept = [item for i, item in enumerate(self.items) if i in keep]
+            dropped = [item for i, item in enumerate(self.items) if i not in keep]
+            text = self.render(kept, dropped)
+            used = tokens.estimate_tokens(text)
+        return text, used, {"items": len(self.items), "kept": len(kept), "tokens": used}
+
+
+class Text:
+    """A long string section cut to fit, keeping the head (or the tail, for the latest reasoning)."""
+
+    def __init__(self, text, keep="head"):
+        self.text = text or ""
+        self.keep = keep
+
+    def fit(self, allowance):
+        text, chars = self.text, len(self.text)
+        used = tokens.estimate_tokens(text)
+        while used > allowance and chars > 0:
+            # Shrink at the text's own chars-per-token ratio; the omission marker costs about 10 tokens
+            chars = max(0, min(chars - 1, int(chars * (allowance - 10) / used)))
+            marker = f"...[{len(self.text) - chars} characters omitted]..."
+            text = self.text[:chars] + marker if self.keep == "head" else marker + self.text[len(self.text) - chars:]
+            used = tokens.estimate_tokens(text)
+        return text, used, {"chars": len(self.text), "kept_chars": chars, "tokens": used}
+
+
+class Prompt:
+    __slots__ = ("text", "tokens", "budget", "report")
+
+    def __init__(self, text, tokens, budget, report):
+        self.text = text
+        self.tokens = tokens
+        self.budget = budget
+        self.report = report
+
+    @property
+    def trimmed(self) -> bool:
+        return any(r.get("kept", r.get("kept_chars")) != r.get("items", r.get("chars")) for r in self.report.values())
+
+    def __str__(self):
+        return self.text
+
+
+def build(template: str, budget=DEFAULT_BUDGET, **values) -> Prompt:
+    """Fill `template`, trimming History/Text values (in argument order) so the prompt fits `budget` tokens."""
+    fixed = {name: compact(value) for name, value in values.items() if not isinstance(value, (History, Text))}
+    trimmable = {name: value for name, value in values.items() if isinstance(value, (History, Text))}
+
+    remaining = budget - tokens.estimate_tokens(template.format(**fixed, **{name: "" for name in trimmable}))
+    rendered, report = {}, {}
+    for n, (name, section) in enumerate(trimmable.items()):
+        # Split what is left evenly; whatever a section doesn't use goes to the next ones
+        share = remaining // (len(trimmable) - n)
+        rendered[name], used, report[name] = section.fit(max(0, share))
+        remaining -= used
+
+    text = template.format(**fixed, **rendered)
+    prompt = Prompt(text, tokens.estimate_tokens(text), budget, report)
+    span = tracing.current_span()
+    if span is not None:
+        if prompt.trimmed:
+            span.set(prompt_trimmed={name: r for name, r in report.items()})
+        if prompt.tokens > budget:
+            # Plain values are never cut, so they alone can push the prompt past the budget
+            span.set(prompt_over_budget=prompt.tokens - budget)
+    return prompt
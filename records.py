@@ -0,0 +1,293 @@
+"""
+Compact record types for transactions, purchases, browsing events, products
+and user profiles.
+
+The agents pass these around as plain dicts: every one carries its own hash
+table, repeats the same merchant/location/category strings, and keeps ISO
+timestamps that are parsed again wherever they are used. The records here
+use __slots__, parse timestamps/dates once on construction and intern the
+categorical strings, so a million transactions share one copy of "Online".
+
+Records are also Mappings over their fields (record["amount"],
+record.get("merchant"), {**record}), so the agents, feature extraction and
+prompt building accept them wherever they accept dicts. A record built with
+from_dict has the source dict's keys in the source order, explicit nulls
+included; unknown keys are kept in `extra`. `to_dict()` gives back the source
+dict exactly (timestamps as the original strings), so a prompt built from
+records is the one built from the dicts, and `json_default` lets json.dumps
+embed records in prompts. Records built directly omit fields that are None.
+
+    transaction = records.Transaction.from_dict(raw)
+    history = records.from_dicts(records.Transaction, raw_history)
+    agent.analyze_transaction(transaction, history)
+"""
+
+import abc
+import sys
+from collections.abc import Mapping
+from datetime import date, datetime
+
+_intern = sys.intern
+
+
+def _interned(value):
+    return _intern(value) if type(value) is str else value
+
+
+def _timestamp(value):
+    return datetime.fromisoformat(value) if type(value) is str else value
+
+
+def _date(value):
+    return date.fromisoformat(value) if type(value) is str else value
+
+
+def _isoformat(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+# Source key orders, shared between the records that have the same one
+_key_orders = {}
+
+
+class Record(Mapping):
+    """Mapping view, pickling and repr shared by the record types; subclasses list their fields in __slots__."""
+
+    # _keys: the source dict's keys in order (None for a record built directly);
+    # _raw: original date/time strings that isoformat() would not reproduce, or None
+    __slots__ = ("extra", "_keys", "_raw")
+    _FIELDS = frozenset()
+    # Fields parsed from ISO strings
+    _DATE_FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._FIELDS = frozenset(cls.__slots__)
+
+    @classmethod
+    def _extra(cls, data):
+        """Keys of `data` that are not fields, or None."""
+        if cls._FIELDS.issuperset(data):
+            return None
+        return {key: value for key, value in data.items() if key not in cls._FIELDS}
+
+    def _keep_source(self, data):
+        """Remember what to_dict needs to give `data` back exactly; returns self."""
+        keys = tuple(data)
+        self._keys = _key_orders.setdefault(keys, keys)
+        for name in self._DATE_FIELDS:
+            value = data.get(name)
+            if type(value) is str and getattr(self, name).isoformat() != value:
+                if self._raw is None:
+                    self._raw = {}
+                self._raw[name] = value
+        return self
+
+    @abc.abstractmethod
+    def to_dict(self) -> dict:
+        """The record as a JSON-ready dict (the source dict, for a record built with from_dict)."""
+
+    def _as_dict(self, fields) -> dict:
+        """to_dict for the field values in `fields` (name -> value, in declaration order)."""
+        for name in self._DATE_FIELDS:
+            fields[name] = _isoformat(fields[name])
+        if self._raw:
+            fields.update(self._raw)
+        if self._keys is None:
+            result = {name: value for name, value in fields.items() if value is not None}
+            if self.extra:
+                result.update(self.extra)
+            return result
+        if self._keys == self.__slots__:
+            # The common case: the source had exactly the fields, in declaration order
+            return fields
+        extra = self.extra
+        return {key: fields[key] if key in fields else extra[key] for key in self._keys}
+
+    def __getitem__(self, key):
+        if key in self._FIELDS:
+            value = getattr(self, key)
+            if value is not None or (self._keys is not None and key in self._keys):
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __iter__(self):
+        if self._keys is not None:
+            yield from self._keys
+            return
+        for name in self.__slots__:
+            if getattr(self, name) is not None:
+                yield name
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        if self._keys is not None:
+            return len(self._keys)
+        return sum(getattr(self, name) is not None for name in self.__slots__) + len(self.extra or ())
+
+    def __reduce__(self):
+        return type(self).from_dict, (self.to_dict(),)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Transaction(Record):
+    __slots__ = ("user_id", "timestamp", "amount", "merchant", "merchant_category", "location")
+    _DATE_FIELDS = ("timestamp",)
+
+    def __init__(self, user_id, timestamp, amount, merchant=None, merchant_category=None, location=None,
+                 extra=None):
+        self.user_id = _interned(user_id)
+        self.timestamp = _timestamp(timestamp)
+        self.amount = amount
+        self.merchant = _interned(merchant)
+        self.merchant_category = _interned(merchant_category)
+        self.location = _interned(location)
+        self.extra = extra
+        self._keys = self._raw = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if type(data) is cls:
+            return data
+        get = data.get
+        return cls(get("user_id"), get("timestamp"), get("amount"), get("merchant"), get("merchant_category"),
+                   get("location"), cls._extra(data))._keep_source(data)
+
+    def to_dict(self) -> dict:
+        return self._as_dict({"user_id": self.user_id, "timestamp": self.timestamp, "amount": self.amount,
+                              "merchant": self.merchant, "merchant_category": self.merchant_category,
+                              "location": self.location})
+
+
+class Purchase(Record):
+    __slots__ = ("date", "product", "category", "price")
+    _DATE_FIELDS = ("date",)
+
+    def __init__(self, date, product, category=None, price=None, extra=None):
+        self.date = _date(date)
+        self.product = _interned(product)
+        self.category = _interned(category)
+        self.price = price
+        self.extra = extra
+        self._keys = self._raw = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if type(data) is cls:
+            return data
+        get = data.get
+        return cls(get("date"), get("product"), get("category"), get("price"), cls._extra(data))._keep_source(data)
+
+    def to_dict(self) -> dict:
+        return self._as_dict({"date": self.date, "product": self.product, "category": self.category,
+                              "price": self.price})
+
+
+class BrowsingEvent(Record):
+    __slots__ = ("date", "viewed_products")
+    _DATE_FIELDS = ("date",)
+
+    def __init__(self, date, viewed_products=None, extra=None):
+        self.date = _date(date)
+        if viewed_products is not None:
+            viewed_products = tuple(_interned(name) for name in viewed_products)
+        self.viewed_products = viewed_products
+        self.extra = extra
+        self._keys = self._raw = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if type(data) is cls:
+            return data
+        return cls(data.get("date"), data.get("viewed_products"), cls._extra(data))._keep_source(data)
+
+    def to_dict(self) -> dict:
+        viewed = list(self.viewed_products) if self.viewed_products is not None else None
+        return self._as_dict({"date": self.date, "viewed_products": viewed})
+
+
+class Product(Record):
+    __slots__ = ("id", "name", "category", "brand", "price", "description")
+
+    def __init__(self, id, name, category=None, brand=None, price=None, description=None, extra=None):
+        self.id = _interned(id)
+        self.name = name
+        self.category = _interned(category)
+        self.brand = _interned(brand)
+        self.price = price
+        self.description = description
+        self.extra = extra
+        self._keys = self._raw = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if type(data) is cls:
+            return data
+        get = data.get
+        return cls(get("id"), get("name"), get("category"), get("brand"), get("price"), get("description"),
+                   cls._extra(data))._keep_source(data)
+
+    def to_dict(self) -> dict:
+        return self._as_dict({"id": self.id, "name": self.name, "category": self.category, "brand": self.brand,
+                              "price": self.price, "description": self.description})
+
+
+class UserProfile(Record):
+    """Profile fields used by the advisor and recommendation agents; anything else stays in `extra`."""
+
+    __slots__ = ("user_id", "age", "gender", "location", "joined_date", "income", "savings", "debt", "dependents",
+                 "existing_investments", "risk_tolerance", "preferences")
+    _DATE_FIELDS = ("joined_date",)
+
+    def __init__(self, user_id=None, age=None, gender=None, location=None, joined_date=None, income=None,
+                 savings=None, debt=None, dependents=None, existing_investments=None, risk_tolerance=None,
+                 preferences=None, extra=None):
+        self.user_id = _interned(user_id)
+        self.age = age
+        self.gender = _interned(gender)
+        self.location = _interned(location)
+        self.joined_date = _date(joined_date)
+        self.income = income
+        self.savings = savings
+        self.debt = debt
+        self.dependents = dependents
+        self.existing_investments = existing_investments
+        self.risk_tolerance = _interned(risk_tolerance)
+        if preferences and preferences.get("favorite_categories"):
+            preferences = {**preferences,
+                           "favorite_categories": [_interned(c) for c in preferences["favorite_categories"]]}
+        self.preferences = preferences
+        self.extra = extra
+        self._keys = self._raw = None
+
+    @classmethod
+    def from_dict(cls, data):
+        if type(data) is cls:
+            return data
+        get = data.get
+        return cls(get("user_id"), get("age"), get("gender"), get("location"), get("joined_date"), get("income"),
+                   get("savings"), get("debt"), get("dependents"), get("existing_investments"),
+                   get("risk_tolerance"), get("preferences"), cls._extra(data))._keep_source(data)
+
+    def to_dict(self) -> dict:
+        return self._as_dict({name: getattr(self, name) for name in self.__slots__})
+
+
+def from_dicts(record_type, items) -> list:
+    """A list of records from a list of dicts (records of that type are passed through)."""
+    from_dict = record_type.from_dict
+    return [from_dict(item) for item in items or ()]
+
+
+def json_default(value):
+    """json.dumps `default` for records, dates and datetimes; anything else becomes str."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
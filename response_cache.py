@@ -0,0 +1,125 @@
+"""
+Content-addressed cache for deterministic (temperature=0) LLM responses.
+
+Entries are keyed by a SHA-256 of (backend, model, prompt, params), where
+llm_client passes the backend's cache_identity(): the provider name for the
+shared clients, extended with the client class and endpoint for an injected
+one, so stand-ins and providers never share entries. There is an
+in-memory LRU tier and an optional SQLite tier on disk, both with TTL and
+size-based eviction.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def make_key(backend: str, model: str, prompt: str, params=None) -> str:
+    """Hash everything that determines a deterministic response."""
+    payload = json.dumps([backend, model, prompt, params or {}], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional SQLite) response cache with hit/miss counters."""
+
+    def __init__(self, max_entries=1024, ttl=24 * 3600, db_path=None, max_disk_entries=100_000):
+        self.max_entries = max_entries
+        self.ttl = ttl  # seconds, None means entries never expire
+        self.max_disk_entries = max_disk_entries
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """Return the cached value or None."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    self._memory.move_to_end(key)
+                    self.stats["hits"] += 1
+                    return entry[0]
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    if not self._expired(row[1], now):
+                        self._db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, row[0], row[1])
+                        self.stats["disk_hits"] += 1
+                        return row[0]
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            return None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                count = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+                if count > self.max_disk_entries:
+                    # Drop the least recently used rows
+                    self._db.execute(
+                        "DELETE FROM responses WHERE key IN "
+                        "(SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                        (count - self.max_disk_entries,),
+                    )
+                self._db.commit()
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get_or_call(self, key, call, bypass=False):
+        """Return the cached value for key, or call() and cache its result. bypass skips the lookup."""
+        if bypass:
+            with self._lock:
+                self.stats["bypassed"] += 1
+        else:
+            value = self.get(key)
+            if value is not None:
+                return value
+        value = call()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
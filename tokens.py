@@ -0,0 +1,21 @@
+"""
+Local token estimation.
+
+Approximates BPE tokenizers (cl100k/o200k style) without loading one: a word
+costs one token per ~6 letters, a number one per 3 digits, and every
+punctuation mark (JSON braces, quotes, colons) and line break with its
+indentation costs one. Close enough to budget prompts and trace token use,
+and fast enough to run on every call.
+"""
+
+import re
+
+PIECES = re.compile(r"[A-Za-z]+|\d+|\s*\n\s*|[^\sA-Za-z\d]")
+# Extra tokens for long words and numbers: one per further 6 letters / 3 digits
+LONG_PIECES = re.compile(r"[A-Za-z]{6}(?=[A-Za-z])|\d{3}(?=\d)")
+
+
+def estimate_tokens(text) -> int:
+    if not text:
+        return 0
+    return len(PIECES.findall(text)) + len(LONG_PIECES.findall(text))
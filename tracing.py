@@ -0,0 +1,296 @@
+"""
+Lightweight tracing and metrics for agent runs.
+
+An agent entry point opens a root span, which starts a new trace id. Work inside
+it (plan, each step, summary, user analysis, ...) opens child spans, and every
+LLM call made through llm_client records an "llm" span with backend, model,
+estimated prompt/completion tokens, latency, cache hit and retry count.
+Finished spans go to a bounded in-memory buffer (export_jsonl) and update
+per-agent counters and latency histograms (prometheus_text).
+
+The current span lives in a contextvar; use `bind` when handing work to a
+thread pool so child spans keep their parent, and `span_generator` (not
+`with span(...)` around a yield) for a span covering a generator, or
+`aspan_generator` for an async one. Set `tracer.enabled = False` to turn
+recording off.
+"""
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current = contextvars.ContextVar("tracing_current_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "agent", "start", "duration", "attrs")
+
+    def __init__(self, name, parent, agent, attrs):
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(8).hex()
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.agent = agent or (parent.agent if parent is not None else None)
+        self.start = time.time()
+        self.duration = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "agent": self.agent,
+            "start": self.start,
+            "duration_s": self.duration,
+            **self.attrs,
+        }
+
+
+class Tracer:
+    """Keeps the last `max_spans` finished spans and aggregate metrics per agent."""
+
+    def __init__(self, max_spans=10_000, buckets=LATENCY_BUCKETS):
+        self.enabled = True
+        self.buckets = buckets
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)  # (metric, labels) -> value
+        self._histograms = {}  # labels -> [count per bucket..., +Inf count, sum]
+
+    def record(self, span):
+        labels = (("agent", span.agent or ""), ("span", span.name))
+        with self._lock:
+            self.spans.append(span)
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if span.duration <= bound:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-1] += span.duration
+            if span.attrs.get("error"):
+                self._counters["agent_span_errors_total", labels] += 1
+            if span.name == "llm":
+                attrs = span.attrs
+                llm_labels = (("agent", span.agent or ""), ("step", attrs.get("step", "")),
+                              ("backend", attrs.get("backend", "")), ("model", attrs.get("model", "")))
+                self._counters["agent_llm_calls_total", llm_labels] += 1
+                self._counters["agent_llm_cache_hits_total", llm_labels] += bool(attrs.get("cache_hit"))
+                self._counters["agent_llm_retries_total", llm_labels] += attrs.get("retries", 0)
+                self._counters["agent_llm_prompt_tokens_total", llm_labels] += attrs.get("prompt_tokens", 0)
+                self._counters["agent_llm_completion_tokens_total", llm_labels] += attrs.get("completion_tokens", 0)
+                self._counters["agent_llm_cached_tokens_total", llm_labels] += attrs.get("cached_tokens", 0)
+
+    def export_jsonl(self, out, clear=True) -> int:
+        """Write buffered spans to a path or file object as JSONL; returns how many were written."""
+        with self._lock:
+            spans = list(self.spans)
+            if clear:
+                self.spans.clear()
+        lines = "".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans)
+        if isinstance(out, str):
+            with open(out, "a", encoding="utf-8") as f:
+                f.write(lines)
+        else:
+            out.write(lines)
+        return len(spans)
+
+    def prompt_cache_report(self) -> dict:
+        """
+        Cached share of prompt tokens over the buffered llm spans, overall and per trace (one agent run),
+        as reported by the provider (OpenAI cached_tokens, Ollama KV reuse, FakeBackend's simulation).
+        """
+        with self._lock:
+            spans = [span for span in self.spans if span.name == "llm" and not span.attrs.get("cache_hit")]
+        traces = {}
+        for span in spans:
+            totals = traces.setdefault(span.trace_id, {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0})
+            totals["calls"] += 1
+            totals["prompt_tokens"] += span.attrs.get("prompt_tokens", 0)
+            totals["cached_tokens"] += span.attrs.get("cached_tokens", 0)
+        overall = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        for totals in traces.values():
+            for key in overall:
+                overall[key] += totals[key]
+        for totals in list(traces.values()) + [overall]:
+            totals["cached_ratio"] = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+        return {"overall": overall, "traces": traces}
+
+    def prometheus_text(self) -> str:
+        """Counters and latency histograms in the Prometheus text exposition format."""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((labels, list(values)) for labels, values in self._histograms.items())
+
+        lines = []
+        previous = None
+        for (metric, labels), value in counters:
+            if metric != previous:
+                lines.append(f"# TYPE {metric} counter")
+                previous = metric
+            lines.append(f"{metric}{_labels(labels)} {value:g}")
+
+        if histograms:
+            lines.append("# TYPE agent_span_latency_seconds histogram")
+        for labels, values in histograms:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                lines.append(f"agent_span_latency_seconds_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"agent_span_latency_seconds_sum{_labels(labels)} {values[-1]:g}")
+            lines.append(f"agent_span_latency_seconds_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def _labels(labels) -> str:
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+               for key, value in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+tracer = Tracer()
+
+
+@contextlib.contextmanager
+def span(name, agent=None, **attrs):
+    """Open a span under the current one (or start a new trace); yields the Span, or None when disabled."""
+    if not tracer.enabled:
+        yield None
+        return
+    current = Span(name, _current.get(), agent, attrs)
+    token = _current.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _current.reset(token)
+        tracer.record(current)
+
+
+def span_generator(name, generator, agent=None, **attrs):
+    """
+    Run a generator inside span `name`, yielding what it yields and returning its result.
+    Unlike `with span(...)` around a yield, the span is current only while the generator
+    runs, so the consumer never sees it and may resume the generator from another context.
+    """
+    if not tracer.enabled:
+        return (yield from generator)
+    current = Span(name, _current.get(), agent, attrs)
+    start = time.perf_counter()
+    try:
+        return (yield from _run_in_span(current, generator))
+    except BaseException as e:
+        current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        tracer.record(current)
+
+
+def _run_in_span(current, generator):
+    """Drive generator with `current` set as the current span around each resume, never across a yield."""
+    resume, value = generator.send, None
+    while True:
+        token = _current.set(current)
+        try:
+            chunk = resume(value)
+        except StopIteration as done:
+            return done.value
+        finally:
+            _current.reset(token)
+        try:
+            resume, value = generator.send, (yield chunk)
+        except GeneratorExit:
+            token = _current.set(current)
+            try:
+                generator.close()
+            finally:
+                _current.reset(token)
+            raise
+        except BaseException as e:
+            resume, value = generator.throw, e
+
+
+async def aspan_generator(name, generator, agent=None, **attrs):
+    """span_generator for an async generator: the span is current only while it runs."""
+    current = Span(name, _current.get(), agent, attrs) if tracer.enabled else None
+    start = time.perf_counter()
+    try:
+        while True:
+            token = _current.set(current) if current is not None else None
+            try:
+                chunk = await generator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                if token is not None:
+                    _current.reset(token)
+            yield chunk
+    except BaseException as e:
+        if current is not None:
+            current.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        token = _current.set(current) if current is not None else None
+        try:
+            await generator.aclose()
+        finally:
+            if token is not None:
+                _current.reset(token)
+            if current is not None:
+                current.duration = time.perf_counter() - start
+                tracer.record(current)
+
+
+def current_span():
+    return _current.get()
+
+
+def traced(name):
+    """Decorator: run an agent method (or generator method) inside span `name`, labelled with the agent class."""
+    def decorate(method):
+        if inspect.isgeneratorfunction(method):
+            @functools.wraps(method)
+            def generator_wrapper(self, *args, **kwargs):
+                return (yield from span_generator(name, method(self, *args, **kwargs), agent=type(self).__name__))
+            return generator_wrapper
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with span(name, agent=type(self).__name__):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def bind(fn):
+    """Wrap fn to run in a copy of the caller's context, so spans opened in pool threads nest correctly."""
+    return functools.partial(contextvars.copy_context().run, fn)
@@ -0,0 +1,141 @@
+"""
+Streaming fraud scoring over JSONL.
+
+Reads one transaction per line (from a file or stdin), keeps a bounded
+per-user history in memory, calls the agent's `analyze_transaction` on each
+event and writes one JSON result per line, in input order. Only
+`max_pending` events are in flight at once, so reading blocks while the
+agent falls behind and a large file is never loaded whole.
+
+    python transaction_stream.py --agent manual events.jsonl -o scores.jsonl
+
+Each input line is a transaction dict with a "user_id" field, e.g.
+{"user_id": "U1", "timestamp": "2025-04-19T03:45:00", "amount": 9999.99,
+ "merchant": "Electronics Store", "merchant_category": "Electronics", "location": "New Delhi"}
+"""
+
+import argparse
+import sys
+from collections import OrderedDict, deque
+from datetime import timedelta
+
+import cot_agents
+import feature_store
+import fraud_features
+import fraud_prescreen
+import jsonl_pipeline
+import records
+
+# --agent choice -> cot_agents name
+AGENTS = {
+    "cot": "fraud_cot",
+    "manual": "fraud_manual",
+    "ollama": "fraud_ollama",
+}
+
+
+def load_agent(name: str):
+    """Instantiate one of the fraud agents."""
+    return cot_agents.create(AGENTS[name])
+
+
+class UserHistories:
+    """Bounded in-memory history per user: at most max_events each, max_users in total (LRU)."""
+
+    def __init__(self, max_users=100_000, max_events=1000, window=timedelta(days=30)):
+        self.max_users = max_users
+        self.max_events = max_events
+        self.window = window
+        self._users = OrderedDict()
+
+    def snapshot(self, user_id, transaction) -> list:
+        """History before this transaction (as a list), then record the transaction."""
+        events = self._users.get(user_id)
+        if events is None:
+            events = self._users[user_id] = deque(maxlen=self.max_events)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+
+        # Events arrive in time order, so expired ones are at the left
+        time = fraud_features.utc_naive(transaction["timestamp"])
+        cutoff = time - self.window
+        while events and events[0][0] < cutoff:
+            events.popleft()
+
+        history = [tx for _, tx in events]
+        events.append((time, transaction))
+        return history
+
+
+def read_transactions(lines):
+    """
+    Yield (line_number, transaction or None, error or None) for each non-blank line. A
+    transaction that could not be scored (or would break its user's history) is an error.
+    """
+    for line_number, transaction, error in jsonl_pipeline.read_objects(lines):
+        if error is None:
+            try:
+                feature_store.user_key(transaction)
+                feature_store.parse_event(transaction)
+            except KeyError as e:
+                error = f"transaction needs {e}"
+            except (TypeError, ValueError) as e:
+                error = str(e)
+        if error is not None:
+            yield line_number, None, error
+            continue
+        # Compact record: histories hold these for up to max_users * max_events events
+        yield line_number, records.Transaction.from_dict(transaction), None
+
+
+def _score(agent, line_number, transaction, history):
+    try:
+        result = agent.analyze_transaction(transaction, history)
+        return {"line": line_number, "user_id": transaction["user_id"], "transaction": transaction, **result}
+    except Exception as e:
+        return {"line": line_number, "user_id": transaction["user_id"], "error": f"{type(e).__name__}: {e}"}
+
+
+def score_stream(agent, lines, out, workers=4, max_pending=64, histories=None):
+    """Score every transaction in `lines` and write JSONL results to `out`. Returns the count written."""
+    histories = histories or UserHistories()
+
+    def with_history():
+        # Runs in the reading thread, so histories see the transactions in input order
+        for line_number, transaction, error in read_transactions(lines):
+            if error is None:
+                transaction = (transaction, histories.snapshot(transaction["user_id"], transaction))
+            yield line_number, transaction, error
+
+    def work(line_number, scored):
+        return _score(agent, line_number, *scored)
+
+    return jsonl_pipeline.process(with_history(), work, out, workers, max_pending, default=records.json_default)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream JSONL transactions through a fraud agent.")
+    jsonl_pipeline.add_arguments(parser, "transactions")
+    parser.add_argument("--agent", choices=sorted(AGENTS), default="manual")
+    parser.add_argument("--max-users", type=int, default=100_000)
+    parser.add_argument("--max-events", type=int, default=1000, help="history kept per user")
+    parser.add_argument("--prescreen", action="store_true", help="decide clear-cut cases locally")
+    parser.add_argument("--low", type=float, default=20, help="prescreen score below which risk is low")
+    parser.add_argument("--high", type=float, default=80, help="prescreen score from which risk is high")
+    args = parser.parse_args(argv)
+
+    agent = load_agent(args.agent)
+    if args.prescreen:
+        agent = fraud_prescreen.PreScreenedFraudAgent(agent, low_threshold=args.low, high_threshold=args.high)
+    histories = UserHistories(max_users=args.max_users, max_events=args.max_events)
+    with jsonl_pipeline.opened(args) as (infile, outfile):
+        count = score_stream(agent, infile, outfile, args.workers, args.max_pending, histories)
+    print(f"Scored {count} transactions", file=sys.stderr)
+    if args.prescreen:
+        print(f"Prescreen tiers: {agent.counters}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
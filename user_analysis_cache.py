@@ -0,0 +1,115 @@
+"""
+Per-user cache for ProductRecommendationAgent's behavior analysis.
+
+Entries are keyed by user_id and versioned by a fingerprint of the inputs
+(profile, purchases, browsing). A new purchase or browsing event changes the
+fingerprint (or `invalidate` can be called on the event), which marks the
+entry stale. Stale entries are still served while a single background
+refresh runs (stale-while-revalidate), so returning users skip the
+analysis call on the hot path. Refreshes run at the scheduler's "batch"
+priority, inside the trace of the request that found the entry stale.
+"""
+
+import hashlib
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import llm_scheduler
+import records
+import tracing
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(*inputs) -> str:
+    payload = json.dumps(inputs, sort_keys=True, default=records.json_default)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class UserAnalysisCache:
+    """user_id -> (fingerprint, analysis) with background refresh of stale entries."""
+
+    def __init__(self, max_users=100_000, refresh_workers=2, stale_while_revalidate=True):
+        self.max_users = max_users
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0}
+        # (user_id, exception) of the most recent failed background refresh
+        self.last_refresh_error = None
+        self._entries = {}  # user_id -> [fingerprint, analysis]
+        self._refreshing = {}  # user_id -> Future of the running refresh
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=refresh_workers)
+        self._closed = False
+
+    def get(self, user_id, version, compute):
+        """Cached analysis for user_id at `version`, calling compute() when missing or stale."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                self.stats["hits"] += 1
+                return entry[1]
+            if entry is not None and self.stale_while_revalidate:
+                self.stats["stale_hits"] += 1
+                if user_id not in self._refreshing and not self._closed:
+                    # bind: the refresh's spans join the request's trace
+                    self._refreshing[user_id] = self._pool.submit(tracing.bind(self._refresh), user_id, version,
+                                                                  compute)
+                return entry[1]
+            self.stats["misses"] += 1
+
+        analysis = compute()
+        self._store(user_id, version, analysis)
+        return analysis
+
+    def _refresh(self, user_id, version, compute):
+        try:
+            # Nobody is waiting for it, so it yields to interactive calls in the scheduler
+            with llm_scheduler.priority("batch"):
+                analysis = compute()
+            with self._lock:
+                self.stats["refreshes"] += 1
+            self._store(user_id, version, analysis)
+        except Exception as e:
+            # Nobody waits on this future: record the failure and keep serving the stale entry
+            with self._lock:
+                self.stats["refresh_errors"] += 1
+                self.last_refresh_error = (user_id, e)
+            logger.warning("background analysis refresh for user %s failed", user_id, exc_info=True)
+        finally:
+            with self._lock:
+                self._refreshing.pop(user_id, None)
+
+    def _store(self, user_id, version, analysis):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._entries[user_id] = [version, analysis]
+            # Dicts keep insertion order, so the first key is the least recently stored user
+            while len(self._entries) > self.max_users:
+                del self._entries[next(iter(self._entries))]
+
+    def peek(self, user_id):
+        """Latest analysis for the user (possibly stale), or None."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            return entry[1] if entry is not None else None
+
+    def invalidate(self, user_id):
+        """Mark the user's entry stale, e.g. on a new purchase or browsing event."""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry[0] = None
+
+    def wait_for_refreshes(self):
+        """Block until queued background refreshes have finished (mainly for scripts and tests)."""
+        with self._lock:
+            running = list(self._refreshing.values())
+        wait(running)
+
+    def close(self, wait=True):
+        """Stop the refresh pool; later stale hits are served without refreshing."""
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=wait)